@@ -0,0 +1,99 @@
+"""
+Benchmark of DFG construction on generated modules.
+
+usage: python benchmark/bench_dfg.py [--sizes N [N ...]]
+
+For each size, a module of about N statements is generated, and the time of
+each DFG stage is reported. Building the scalpel CFG and SSA is reported
+apart from indexing and dependency resolution, which is our own code and is
+expected to scale linearly with the number of statements.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from core.process.frontend.impl.dfg_lib.build import (
+    build_dependencies,
+    build_flattened_cfg,
+    build_ssa,
+    extract_paths,
+)
+from core.process.frontend.impl.dfg_lib.index import (
+    index_constant,
+    index_dependency,
+    index_ssa,
+    mend_ssa,
+)
+
+# Number of statements in each generated function.
+FUNCTION_SIZE = 50
+
+
+def generate_module(size):
+    """
+    Generate a module of functions, each being a chain of assignments
+    depending on the parameters and the previous statements.
+    """
+    lines = []
+    for i in range(max(1, size // FUNCTION_SIZE)):
+        lines.append(f"def func_{i}(a, b):")
+        lines.append("    v0 = a + b")
+        for j in range(1, FUNCTION_SIZE - 2):
+            lines.append(f"    v{j} = v{j - 1} * {j} + a")
+        lines.append(f"    return v{FUNCTION_SIZE - 3}")
+        lines.append(f"x_{i} = func_{i}({i}, {i + 1})")
+    return "\n".join(lines) + "\n"
+
+
+def _timed(stages, name, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    stages[name] = stages.get(name, 0) + time.perf_counter() - start
+    return result
+
+
+def run(size):
+    stages = {}
+    source = generate_module(size)
+    flattened_cfg = _timed(stages, "cfg", build_flattened_cfg, source)
+    ssa_results, const_dict = _timed(stages, "ssa", build_ssa, flattened_cfg)
+    _timed(stages, "index", mend_ssa, flattened_cfg, ssa_results, const_dict)
+    deps = _timed(stages, "index", index_dependency, flattened_cfg)
+    consts = _timed(stages, "index", index_constant, const_dict)
+    ssa = _timed(stages, "index", index_ssa, ssa_results)
+    dependencies = _timed(stages, "resolve", build_dependencies, deps, ssa, consts)
+    paths = _timed(stages, "resolve", extract_paths, dependencies)
+    return source.count("\n"), len(paths), stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DFG construction.")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 2000, 5000, 10000],
+        help="Number of statements of the generated modules",
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'stmts':>8} {'paths':>8} {'cfg(s)':>8} {'ssa(s)':>8} "
+        f"{'index(s)':>9} {'resolve(s)':>11} {'ours(us/stmt)':>14}"
+    )
+    for size in args.sizes:
+        stmts, paths, stages = run(size)
+        ours = stages["index"] + stages["resolve"]
+        print(
+            f"{stmts:>8} {paths:>8} {stages['cfg']:>8.3f} {stages['ssa']:>8.3f} "
+            f"{stages['index']:>9.3f} {stages['resolve']:>11.3f} "
+            f"{ours / stmts * 1e6:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
 import pickle
+import sys
+import threading
+from collections import OrderedDict
 from redis import Redis
 
 
@@ -17,6 +20,21 @@ class CacheProxy:
     def get(self, key):
         raise NotImplementedError("get method is not implemented")
 
+    def get_many(self, keys) -> list:
+        """
+        Get the values of all keys, None for missing ones, in the same order.
+        Override it if the cache server can do it in one round trip.
+        """
+        return [self.get(key) for key in keys]
+
+    def set_many(self, mapping: dict):
+        """
+        Set all key-value pairs in the mapping.
+        Override it if the cache server can do it in one round trip.
+        """
+        for key, value in mapping.items():
+            self.set(key, value)
+
     def get_or_set(self, key, value):
         result = self.get(key)
         if result is None:
@@ -27,6 +45,18 @@ class CacheProxy:
     def clear(self):
         raise NotImplementedError("clear method is not implemented")
 
+    def flush(self):
+        """
+        Write out anything buffered. Should be called once all writes are done.
+        """
+        pass
+
+    def stats(self) -> dict:
+        """
+        Counters of the cache, if it keeps any.
+        """
+        return {}
+
     @classmethod
     def _serialize(cls, value):
         return None if value is None else pickle.dumps(value)
@@ -69,6 +99,16 @@ class RedisProxy(CacheProxy):
     def get(self, key):
         return self._deserialize(self.redis.get(key))
 
+    def get_many(self, keys) -> list:
+        if len(keys) == 0:
+            return []
+        return [self._deserialize(value) for value in self.redis.mget(keys)]
+
+    def set_many(self, mapping: dict):
+        if len(mapping) == 0:
+            return
+        self.redis.mset({k: self._serialize(v) for k, v in mapping.items()})
+
     def clear(self):
         self.redis.flushdb()
 
@@ -90,3 +130,255 @@ class MemoryProxy(CacheProxy):
 
     def clear(self):
         self.db.clear()
+
+
+class LruProxy(CacheProxy):
+    """
+    In memory cache that stores values as they are, without serialization.
+    Keys are spread over stripes by hash, each an LRU map with its own lock,
+    so that concurrent workers rarely contend. If a budget is set, it is
+    split among the stripes, and the least recently used entries of a stripe
+    are evicted once its share is exceeded. There are never more stripes
+    than the budget, so that each gets a share of at least 1. As
+    evicted vertex IDs can't be fetched again, the budget should fit all
+    vertices, unless the client doesn't rely on the cache.
+    """
+
+    class Stripe:
+        def __init__(self, max_entries, max_bytes) -> None:
+            self.entries = OrderedDict()
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.lock = threading.Lock()
+
+        def get(self, key):
+            """
+            Should be called with self.lock held.
+            """
+            entry = self.entries.get(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+        def set(self, key, value):
+            """
+            Should be called with self.lock held.
+            """
+            size = sys.getsizeof(key) + sys.getsizeof(value)
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while len(self.entries) > 1 and (
+                0 < self.max_entries < len(self.entries)
+                or 0 < self.max_bytes < self.bytes
+            ):
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def __init__(self, max_entries=0, max_bytes=0, stripes=16):
+        """
+        :param max_entries: max number of entries, 0 for no limit
+        :param max_bytes: max approximate size of keys and values, 0 for no limit
+        """
+        super().__init__()
+        # Each stripe needs a budget of at least 1, as 0 means no limit.
+        for limit in (max_entries, max_bytes):
+            if limit > 0:
+                stripes = min(stripes, limit)
+        stripes = max(1, stripes)
+        self.stripes = [
+            LruProxy.Stripe(
+                _share_of(max_entries, stripes, i), _share_of(max_bytes, stripes, i)
+            )
+            for i in range(stripes)
+        ]
+
+    def _stripe_of(self, key) -> "LruProxy.Stripe":
+        return self.stripes[hash(key) % len(self.stripes)]
+
+    def set(self, key, value):
+        stripe = self._stripe_of(key)
+        with stripe.lock:
+            stripe.set(key, value)
+
+    def get(self, key):
+        stripe = self._stripe_of(key)
+        with stripe.lock:
+            return stripe.get(key)
+
+    def get_many(self, keys) -> list:
+        results = [None] * len(keys)
+        for stripe, group in self._group(enumerate(keys), lambda item: item[1]):
+            with stripe.lock:
+                for i, key in group:
+                    results[i] = stripe.get(key)
+        return results
+
+    def set_many(self, mapping: dict):
+        for stripe, group in self._group(mapping.items(), lambda item: item[0]):
+            with stripe.lock:
+                for key, value in group:
+                    stripe.set(key, value)
+
+    def _group(self, items, key_of):
+        """
+        Group the items by stripe, to take each lock once.
+        """
+        groups = {}
+        for item in items:
+            groups.setdefault(id(self._stripe_of(key_of(item))), []).append(item)
+        for stripe in self.stripes:
+            group = groups.get(id(stripe), None)
+            if group is not None:
+                yield stripe, group
+
+    def clear(self):
+        for stripe in self.stripes:
+            with stripe.lock:
+                stripe.entries.clear()
+                stripe.bytes = 0
+
+    def stats(self) -> dict:
+        stats = {"entries": 0, "bytes": 0, "hits": 0, "misses": 0, "evictions": 0}
+        for stripe in self.stripes:
+            with stripe.lock:
+                stats["entries"] += len(stripe.entries)
+                stats["bytes"] += stripe.bytes
+                stats["hits"] += stripe.hits
+                stats["misses"] += stripe.misses
+                stats["evictions"] += stripe.evictions
+        return stats
+
+
+def _share_of(limit: int, count: int, i: int) -> int:
+    """
+    Split the limit into count shares that add up to it, the first ones
+    taking the remainder.
+    """
+    return limit // count + (1 if i < limit % count else 0)
+
+
+class TieredProxy(CacheProxy):
+    """
+    A local cache (L1) in front of a shared one (L2). Reads go through L1 and
+    fill it from L2 on a miss. Writes go to both, and with write-behind, the
+    writes to L2 are buffered and sent in batches.
+    """
+
+    def __init__(self, l1: CacheProxy, l2: CacheProxy, write_behind=0):
+        """
+        :param write_behind: number of writes to buffer before sending them
+            to L2 at once, 0 to send each write immediately
+        """
+        super().__init__()
+        self.l1 = l1
+        self.l2 = l2
+        self.write_behind = write_behind
+        self._pending = {}
+        # Buffers being written to L2, by id, which are still read from.
+        self._in_flight = {}
+        self._l2_reads = 0
+        self._l2_flushes = 0
+        self._lock = threading.Lock()
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def get_many(self, keys) -> list:
+        results = self.l1.get_many(keys)
+        missing = [i for i, value in enumerate(results) if value is None]
+        if len(missing) == 0:
+            return results
+        with self._lock:
+            # Evicted from L1 before reaching L2.
+            buffers = [self._pending] + list(reversed(self._in_flight.values()))
+            for i in missing:
+                for buffer in buffers:
+                    results[i] = buffer.get(keys[i], None)
+                    if results[i] is not None:
+                        break
+            missing = [i for i in missing if results[i] is None]
+            self._l2_reads += len(missing)
+        if len(missing) == 0:
+            return results
+        values = self.l2.get_many([keys[i] for i in missing])
+        found = {}
+        for i, value in zip(missing, values):
+            if value is not None:
+                results[i] = value
+                found[keys[i]] = value
+        self.l1.set_many(found)
+        return results
+
+    def set_many(self, mapping: dict):
+        self.l1.set_many(mapping)
+        if self.write_behind <= 0:
+            self.l2.set_many(mapping)
+            return
+        with self._lock:
+            self._pending.update(mapping)
+            if len(self._pending) < self.write_behind:
+                return
+            pending = self._take_pending()
+        self._write_pending(pending)
+
+    def flush(self):
+        with self._lock:
+            if len(self._pending) == 0:
+                return
+            pending = self._take_pending()
+        self._write_pending(pending)
+
+    def _take_pending(self) -> dict:
+        """
+        Move the buffered writes in flight. Should be called with self._lock
+        held.
+        """
+        pending, self._pending = self._pending, {}
+        self._in_flight[id(pending)] = pending
+        self._l2_flushes += 1
+        return pending
+
+    def _write_pending(self, pending: dict):
+        """
+        Write the buffer to L2 without holding the lock, so that readers
+        don't wait on it. On failure, the writes are buffered again.
+        """
+        try:
+            self.l2.set_many(pending)
+        except Exception:
+            with self._lock:
+                self._in_flight.pop(id(pending), None)
+                # Writes buffered since then are newer.
+                pending.update(self._pending)
+                self._pending = pending
+            raise
+        with self._lock:
+            self._in_flight.pop(id(pending), None)
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._in_flight.clear()
+        self.l1.clear()
+        self.l2.clear()
+
+    def stats(self) -> dict:
+        stats = {f"l1_{k}": v for k, v in self.l1.stats().items()}
+        with self._lock:
+            stats["l2_reads"] = self._l2_reads
+            stats["l2_flushes"] = self._l2_flushes
+        return stats
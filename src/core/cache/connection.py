@@ -1,5 +1,12 @@
 from lib.shared.logger import logger
-from core.cache.cache_proxy import CacheProxy, MemoryProxy, NoCacheProxy, RedisProxy
+from core.cache.cache_proxy import (
+    CacheProxy,
+    LruProxy,
+    MemoryProxy,
+    NoCacheProxy,
+    RedisProxy,
+    TieredProxy,
+)
 
 _CACHE_PROXY: CacheProxy = None
 
@@ -16,12 +23,18 @@ def _resolve_cache(section: dict) -> CacheProxy:
     """
     Handle cache configuration. The YAML form of the config is as follows:
     CACHE:
-      DATABASE: (none | memory | redis)
+      DATABASE: (none | memory | lru | redis | tiered)
+      LRU: (optional, no limit by default, also the L1 of tiered)
+        MAX_ENTRIES: 1000000
+        MAX_BYTES: 1073741824
+        STRIPES: 16
       REDIS:
         HOST: "211.71.15.48"
         PORT: 6379
         DB: 1
         PASSWORD: sdp123456
+      TIERED: (optional, L1 is LRU and L2 is REDIS)
+        WRITE_BEHIND: 1000
     """
     db = str(section["DATABASE"]).lower()
     if db == "none":
@@ -30,18 +43,42 @@ def _resolve_cache(section: dict) -> CacheProxy:
     if db == "memory":
         logger().info("Using in memory cache")
         return MemoryProxy()
+    if db == "lru":
+        logger().info("Using in memory LRU cache")
+        return _resolve_lru(section)
     if db == "redis":
         logger().info("Using redis cache")
-        return RedisProxy(
-            section["REDIS"]["HOST"],
-            section["REDIS"]["PORT"],
-            section["REDIS"]["DB"],
-            section["REDIS"]["PASSWORD"],
+        return _resolve_redis(section)
+    if db == "tiered":
+        tiered = section.get("TIERED", None) or {}
+        logger().info("Using in memory LRU cache in front of redis cache")
+        return TieredProxy(
+            _resolve_lru(section),
+            _resolve_redis(section),
+            int(tiered.get("WRITE_BEHIND", 0)),
         )
     logger().error(f"Cache provider {db} is not supported")
     return NoCacheProxy()
 
 
+def _resolve_lru(section: dict) -> LruProxy:
+    lru = section.get("LRU", None) or {}
+    return LruProxy(
+        int(lru.get("MAX_ENTRIES", 0)),
+        int(lru.get("MAX_BYTES", 0)),
+        int(lru.get("STRIPES", 16)),
+    )
+
+
+def _resolve_redis(section: dict) -> RedisProxy:
+    return RedisProxy(
+        section["REDIS"]["HOST"],
+        section["REDIS"]["PORT"],
+        section["REDIS"]["DB"],
+        section["REDIS"]["PASSWORD"],
+    )
+
+
 def get_cache_proxy() -> CacheProxy:
     if _CACHE_PROXY is None:
         raise Exception("Cache proxy not initialized")
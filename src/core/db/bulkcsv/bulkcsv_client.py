@@ -0,0 +1,223 @@
+"""
+BulkCSV database writes the graph as CSV files for offline bulk importers, in
+the format of neo4j-admin database import. Loading them offline is much faster
+than adding vertices and edges through a live database.
+
+Vertices go to nodes/<label>.<n>.csv, with the key as the ID of the vertex:
+
+    key:ID,:LABEL,file,code,lineno:long,...
+
+Edges go to relationships/<label>.<n>.csv, referring to vertices by key:
+
+    :START_ID,:END_ID,:TYPE,...
+
+Each file has a header of its own, with a column per property seen so far
+for its label, typed after the first value. When a vertex brings a property
+not in the header, a new file is started with the wider header, and missing
+values are left empty. import.args lists all files as arguments for the
+importer, with paths relative to the directory, and is written when the
+prototype client is closed:
+
+    cd <directory> && neo4j-admin database import full @import.args
+"""
+
+import csv
+import os
+import shutil
+import threading
+from typing import Dict, List, Tuple
+from core.db.client import DbClient
+from core.db.edge_resolver import EdgeResolver, can_resolve
+from core.graph.graph import GraphEdge, GraphVertex
+from lib.shared.logger import logger
+
+# Buffer size of each CSV file handle.
+CSV_BUFFER_SIZE = 1 << 20
+
+# Importer types of property values, strings for anything else.
+_TYPES = {bool: "boolean", int: "long", float: "double"}
+
+_NODE_COLUMNS = ["key:ID", ":LABEL"]
+_RELATIONSHIP_COLUMNS = [":START_ID", ":END_ID", ":TYPE"]
+
+
+class CsvTable:
+    """
+    Property columns of one label, shared by all clients. Columns are only
+    ever appended, so a header covers all older ones.
+    """
+
+    def __init__(self) -> None:
+        # (name, header) of each column
+        self.columns: List[Tuple[str, str]] = []
+        self._names = set()
+
+    def extend(self, props: dict):
+        for name, value in (props or {}).items():
+            if name == "key" or name in self._names:
+                continue
+            self._names.add(name)
+            type_name = _TYPES.get(type(value), None)
+            header = name if type_name is None else f"{name}:{type_name}"
+            self.columns.append((name, header))
+
+
+class BulkCsvState:
+    """
+    Tables and files shared by a BulkCSV client and its clones.
+    """
+
+    def __init__(self) -> None:
+        self.tables: Dict[Tuple[str, str], CsvTable] = {}
+        # (kind, path relative to the directory) of each file
+        self.files: List[Tuple[str, str]] = []
+        self._file_counts = {}
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def columns_of(self, kind: str, label: str, props: dict) -> list:
+        """
+        Return the columns of the label, including all properties given.
+        """
+        with self.lock:
+            table = self.tables.setdefault((kind, label), CsvTable())
+            table.extend(props)
+            return list(table.columns)
+
+    def next_file(self, directory, kind: str, label: str) -> str:
+        with self.lock:
+            index = self._file_counts.get((kind, label), 0)
+            self._file_counts[(kind, label)] = index + 1
+            file = os.path.join(kind, f"{label}.{index}.csv")
+            self.files.append((kind, file))
+            return os.path.join(directory, file)
+
+
+class CsvWriter:
+    """
+    A buffered CSV file of a client, with a fixed header.
+    """
+
+    def __init__(self, file, fixed_columns: List[str], columns) -> None:
+        self.names = [name for name, _ in columns]
+        self._name_set = set(self.names)
+        self._handle = open(
+            file, "w", encoding="utf-8", newline="", buffering=CSV_BUFFER_SIZE
+        )
+        self._writer = csv.writer(self._handle)
+        self._writer.writerow(fixed_columns + [header for _, header in columns])
+
+    def covers(self, props: dict) -> bool:
+        return all(name == "key" or name in self._name_set for name in props or {})
+
+    def write(self, fixed_values: list, props: dict):
+        props = props or {}
+        self._writer.writerow(
+            fixed_values + [props.get(name, None) for name in self.names]
+        )
+
+    def close(self):
+        self._handle.close()
+
+
+class BulkCsvClient(DbClient):
+    """
+    BulkCSV client. Each client writes files of its own, so that workers
+    never wait for each other. Edges are written by key, so no vertex ID
+    is looked up in the cache.
+    """
+
+    def __init__(self, directory, state: BulkCsvState = None) -> None:
+        """
+        :param state: tables and files shared with the prototype, None for a prototype
+        """
+        super().__init__()
+        self.directory = directory
+        self._is_prototype = state is None
+        self.state = BulkCsvState() if state is None else state
+        self._writers: Dict[Tuple[str, str], CsvWriter] = {}
+
+    def clone(self):
+        return BulkCsvClient(self.directory, self.state)
+
+    def drop(self):
+        if os.path.exists(self.directory):
+            shutil.rmtree(self.directory)
+
+    def init(self):
+        os.makedirs(os.path.join(self.directory, "nodes"), exist_ok=True)
+        os.makedirs(os.path.join(self.directory, "relationships"), exist_ok=True)
+
+    def close(self):
+        """
+        Close the files. The prototype also writes import.args, so it should
+        be closed after all of its clones.
+        """
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+        if not self._is_prototype:
+            return
+        if self.state.skipped > 0:
+            logger().warning(
+                f"Skipped {self.state.skipped} edges with missing vertices."
+            )
+        with open(
+            os.path.join(self.directory, "import.args"), "w", encoding="utf-8"
+        ) as f:
+            f.write("--multiline-fields=true\n")
+            # Some vertices are written more than once, and edges may refer
+            # to lines that are no vertex, both of which the writers allow.
+            f.write("--skip-duplicate-nodes=true\n")
+            f.write("--skip-bad-relationships=true\n")
+            for kind, file in self.state.files:
+                f.write(f"--{kind}={file}\n")
+        logger().info(
+            f"Bulk import files written to {self.directory}, "
+            f"see {os.path.join(self.directory, 'import.args')}."
+        )
+
+    def _writer_of(self, kind: str, label: str, props: dict) -> CsvWriter:
+        writer = self._writers.get((kind, label), None)
+        if writer is not None:
+            if writer.covers(props):
+                return writer
+            writer.close()
+        columns = self.state.columns_of(kind, label, props)
+        fixed_columns = _NODE_COLUMNS if kind == "nodes" else _RELATIONSHIP_COLUMNS
+        os.makedirs(os.path.join(self.directory, kind), exist_ok=True)
+        writer = CsvWriter(
+            self.state.next_file(self.directory, kind, label), fixed_columns, columns
+        )
+        self._writers[(kind, label)] = writer
+        return writer
+
+    def add_vertex(self, vertex: GraphVertex):
+        self.add_vertex_bulk([vertex])
+
+    def add_vertex_bulk(self, vertices: List[GraphVertex]):
+        for vertex in vertices:
+            self._writer_of("nodes", vertex.label, vertex.props).write(
+                [vertex.key, vertex.label], vertex.props
+            )
+
+    def can_write_edge(self, edge: GraphEdge) -> bool:
+        return can_resolve(edge)
+
+    def add_edge(self, edge: GraphEdge):
+        self.add_edge_bulk([edge])
+
+    def add_edge_bulk(self, edges: List[GraphEdge]):
+        resolver = EdgeResolver()
+        skipped = 0
+        for edge in edges:
+            keys = resolver.resolve(edge)
+            if keys is None:
+                skipped += 1
+                continue
+            self._writer_of("relationships", edge.label, edge.props).write(
+                [keys[0], keys[1], edge.label], edge.props
+            )
+        if skipped > 0:
+            with self.state.lock:
+                self.state.skipped += skipped
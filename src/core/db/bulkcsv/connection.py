@@ -0,0 +1,23 @@
+"""
+Connection definition for BulkCSV database.
+"""
+
+from core.db.bulkcsv.bulkcsv_client import BulkCsvClient
+
+
+_DIRECTORY = None
+
+
+def resolve_bulkcsv(section: dict):
+    """
+    BULKCSV:
+      DIRECTORY: "./tmp/bulkcsv"
+    """
+    global _DIRECTORY
+    _DIRECTORY = section["DIRECTORY"]
+
+
+def get_bulkcsv_client() -> BulkCsvClient:
+    if _DIRECTORY is None:
+        raise Exception("BulkCSV connection is not initialized")
+    return BulkCsvClient(_DIRECTORY)
@@ -1,3 +1,4 @@
+import asyncio
 from typing import List
 from core.graph.graph import GraphEdge, GraphVertex
 
@@ -47,8 +48,87 @@ class DbClient:
         """
         raise NotImplementedError
 
+    async def add_vertex_bulk_async(self, vertices: List[GraphVertex]):
+        """
+        Add a list of vertices without blocking the event loop. By default,
+        they are added in a thread, one batch at a time, as clients are not
+        meant to be used by many threads at once.
+        """
+        async with self._async_lock():
+            await asyncio.to_thread(self.add_vertex_bulk, vertices)
+
+    async def add_edge_bulk_async(self, edges: List[GraphEdge]):
+        """
+        Add a list of edges without blocking the event loop. By default,
+        the same way as add_vertex_bulk_async.
+        """
+        async with self._async_lock():
+            await asyncio.to_thread(self.add_edge_bulk, edges)
+
+    def _async_lock(self) -> asyncio.Lock:
+        lock = getattr(self, "_async_lock_", None)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._async_lock_ = lock
+        return lock
+
+    def can_write_edge(self, edge: GraphEdge) -> bool:
+        """
+        Whether the edge can be written now, given both of its endpoints
+        are written. Used by streaming backend to hold back edges that
+        depend on data that is not complete yet.
+        """
+        return True
+
     def add_edge_bulk(self, edges: List[GraphEdge]):
         """
         Add a list of edges to the database.
         """
         raise NotImplementedError
+
+    def related_files(self, file: str) -> List[str]:
+        """
+        Get the files linked to the given file by "related" edges, in either
+        direction. Used to apply diff.
+        """
+        raise NotImplementedError
+
+    def drop_file(self, file: str):
+        """
+        Drop all vertices of the given file, and all edges of them. Used to
+        apply diff.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release resources held by the client. The prototype is closed after
+        all of its clones. Clients that hold nothing can ignore it.
+        """
+        pass
+
+    def set_retry(self, max_retry: int):
+        """
+        Set how many times a failed bulk write is retried before giving up.
+        With 0, the failure is raised to the caller instead. Clients that
+        never retry can ignore it.
+        """
+        pass
+
+    def may_have_written(self, error: Exception) -> bool:
+        """
+        Whether a bulk write that raised the error may have been written
+        anyway, so that writing it again could duplicate it. Timeouts and
+        lost connections may come after the database committed the write.
+        """
+        return isinstance(error, (OSError, TimeoutError, asyncio.TimeoutError))
+
+    def unwritten_vertices(self, vertices: List[GraphVertex]) -> List[GraphVertex]:
+        """
+        Return the vertices a bulk write that may have written them did not
+        write, after looking them up, so that only those are written again.
+        Clients that keep the IDs of written vertices should keep those of
+        the vertices found here too. Return None if it can't be told, and
+        the vertices are not written again.
+        """
+        return None
@@ -0,0 +1,23 @@
+"""
+Connection definition for CSR database.
+"""
+
+from core.db.csr.csr_client import CsrClient
+
+
+_DIRECTORY = None
+
+
+def resolve_csr(section: dict):
+    """
+    CSR:
+      DIRECTORY: "./tmp/csr"
+    """
+    global _DIRECTORY
+    _DIRECTORY = section["DIRECTORY"]
+
+
+def get_csr_client() -> CsrClient:
+    if _DIRECTORY is None:
+        raise Exception("CSR connection is not initialized")
+    return CsrClient(_DIRECTORY)
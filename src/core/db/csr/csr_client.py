@@ -0,0 +1,228 @@
+"""
+CSR database exports the graph as flat binary arrays, which can be opened with
+numpy.memmap or mmap without any parsing.
+
+All arrays are little-endian. Vertices are numbered in the order they are
+written, and each property is a column over them:
+
+- An integer column is one int64 per vertex, 0 if missing.
+- A string column is an int64 offsets array of n + 1 entries, and a bytes
+  array of UTF-8 text, where vertex i is bytes[offsets[i]:offsets[i + 1]].
+  Missing values are empty.
+- The label column is one uint8 code per vertex, indexing the label list.
+
+Edges of each label are in CSR form over source vertices: an int64 offsets
+array of n + 1 entries, and an int64 targets array, where the edges out of
+vertex i go to targets[offsets[i]:offsets[i + 1]]. Edge properties are not
+exported, as no frontend emits them.
+
+manifest.json describes all files, and is written last.
+"""
+
+import json
+import os
+import shutil
+import sys
+import threading
+from array import array
+from typing import List
+from core.db.client import DbClient
+from core.db.edge_resolver import EdgeResolver
+from core.graph.graph import GraphEdge, GraphVertex
+from lib.shared.logger import logger
+
+CSR_VERSION = 1
+
+
+class CsrGraph:
+    """
+    Vertices and edges collected by a CSR client and its clones.
+    """
+
+    def __init__(self) -> None:
+        self.vertices: List[GraphVertex] = []
+        self.edges: List[GraphEdge] = []
+        self.lock = threading.Lock()
+
+
+def _write_array(path, typecode, values):
+    data = array(typecode, values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    with open(path, "wb") as f:
+        data.tofile(f)
+
+
+def _prefix_sums(counts) -> array:
+    offsets = array("q", [0]) * (len(counts) + 1)
+    total = 0
+    for i, count in enumerate(counts):
+        total += count
+        offsets[i + 1] = total
+    return offsets
+
+
+def to_csr(vertex_count: int, sources, targets):
+    """
+    Return the CSR offsets and targets arrays of the edges from sources[i]
+    to targets[i], in the order they are given for each source.
+    """
+    counts = [0] * vertex_count
+    for source in sources:
+        counts[source] += 1
+    offsets = _prefix_sums(counts)
+    # Fill targets by a counting sort over sources.
+    cursor = array("q", offsets[:-1])
+    sorted_targets = array("q", [0]) * len(sources)
+    for source, target in zip(sources, targets):
+        sorted_targets[cursor[source]] = target
+        cursor[source] += 1
+    return offsets, sorted_targets
+
+
+class CsrClient(DbClient):
+    """
+    CSR client. Vertices and edges are collected in memory, and written out
+    when the prototype client is closed, as CSR needs all edges at once.
+    """
+
+    def __init__(self, directory, graph: CsrGraph = None) -> None:
+        """
+        :param graph: collected data shared with the prototype, None for a prototype
+        """
+        super().__init__()
+        self.directory = directory
+        self._is_prototype = graph is None
+        self.graph = CsrGraph() if graph is None else graph
+
+    def clone(self):
+        return CsrClient(self.directory, self.graph)
+
+    def drop(self):
+        if os.path.exists(self.directory):
+            shutil.rmtree(self.directory)
+
+    def init(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+    def add_vertex(self, vertex: GraphVertex):
+        self.add_vertex_bulk([vertex])
+
+    def add_vertex_bulk(self, vertices: List[GraphVertex]):
+        with self.graph.lock:
+            self.graph.vertices.extend(vertices)
+
+    def add_edge(self, edge: GraphEdge):
+        self.add_edge_bulk([edge])
+
+    def add_edge_bulk(self, edges: List[GraphEdge]):
+        with self.graph.lock:
+            self.graph.edges.extend(edges)
+
+    def close(self):
+        if self._is_prototype:
+            self.export()
+
+    def export(self):
+        """
+        Write all files. A vertex written more than once under the same key
+        keeps its first occurrence.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with self.graph.lock:
+            vertices = []
+            index = {}
+            for vertex in self.graph.vertices:
+                if vertex.key not in index:
+                    index[vertex.key] = len(vertices)
+                    vertices.append(vertex)
+            manifest = {
+                "version": CSR_VERSION,
+                "byteorder": "little",
+                "vertex_count": len(vertices),
+                "labels": [],
+                "properties": {},
+                "edges": {},
+            }
+            self._write_vertices(vertices, manifest)
+            self._write_edges(index, len(vertices), manifest)
+        self._write(
+            "manifest.json", lambda f: f.write(json.dumps(manifest, indent=2))
+        )
+        logger().info(
+            f"CSR graph exported to {self.directory} with {len(vertices)} vertices."
+        )
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _write(self, name, write):
+        with open(self._path(name), "w", encoding="utf-8") as f:
+            write(f)
+
+    def _write_vertices(self, vertices: List[GraphVertex], manifest: dict):
+        labels = list(dict.fromkeys(vertex.label for vertex in vertices))
+        codes = {label: i for i, label in enumerate(labels)}
+        manifest["labels"] = labels
+        _write_array(
+            self._path("vertex.label.bin"),
+            "B",
+            (codes[vertex.label] for vertex in vertices),
+        )
+        manifest["properties"]["label"] = {
+            "type": "uint8",
+            "file": "vertex.label.bin",
+        }
+
+        names = list(
+            dict.fromkeys(name for vertex in vertices for name in vertex.props or {})
+        )
+        for name in names:
+            values = [(vertex.props or {}).get(name, None) for vertex in vertices]
+            if all(v is None or type(v) is int for v in values):
+                file = f"vertex.{name}.bin"
+                _write_array(self._path(file), "q", (v or 0 for v in values))
+                manifest["properties"][name] = {"type": "int64", "file": file}
+                continue
+            encoded = [b"" if v is None else str(v).encode("utf-8") for v in values]
+            offsets_file = f"vertex.{name}.offsets.bin"
+            bytes_file = f"vertex.{name}.bytes.bin"
+            _write_array(
+                self._path(offsets_file), "q", _prefix_sums([len(b) for b in encoded])
+            )
+            with open(self._path(bytes_file), "wb") as f:
+                for b in encoded:
+                    f.write(b)
+            manifest["properties"][name] = {
+                "type": "string",
+                "offsets": offsets_file,
+                "bytes": bytes_file,
+            }
+
+    def _write_edges(self, index: dict, vertex_count: int, manifest: dict):
+        resolver = EdgeResolver(index)
+        # label -> list of (source, target)
+        pairs = {}
+        missing = 0
+        for edge in self.graph.edges:
+            keys = resolver.resolve(edge)
+            if keys is None:
+                missing += 1
+                continue
+            pairs.setdefault(edge.label, []).append((index[keys[0]], index[keys[1]]))
+        if missing > 0:
+            logger().warning(f"Skipped {missing} edges with missing vertices.")
+
+        for label, edges in pairs.items():
+            offsets, targets = to_csr(
+                vertex_count, [s for s, _ in edges], [t for _, t in edges]
+            )
+            offsets_file = f"edge.{label}.offsets.bin"
+            targets_file = f"edge.{label}.targets.bin"
+            _write_array(self._path(offsets_file), "q", offsets)
+            _write_array(self._path(targets_file), "q", targets)
+            manifest["edges"][label] = {
+                "count": len(edges),
+                "offsets": offsets_file,
+                "targets": targets_file,
+            }
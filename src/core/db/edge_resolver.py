@@ -0,0 +1,75 @@
+"""
+Resolve edges to the keys of the vertices they connect, for databases that
+write edges by key instead of by IDs looked up in the cache.
+"""
+
+from typing import Container, Tuple
+from core.graph.graph import GraphEdge, GraphVertex
+from core.process.frontend.impl.cfg_lib.span_db import (
+    SpanIndex,
+    get_span_index,
+    is_span_db_sealed,
+)
+from core.process.frontend.impl.cg_lib.cg_db import (
+    CgIndex,
+    get_cg_index,
+    is_cg_db_sealed,
+)
+
+
+def can_resolve(edge: GraphEdge) -> bool:
+    """
+    Whether the edge can be resolved for good now. Endpoints are resolved by
+    the spans of statements, and the direction of dfg edges depends on the
+    CG tables, so both should be complete. Meant for DbClient.can_write_edge.
+    """
+    return is_span_db_sealed() and (edge.label != "dfg" or is_cg_db_sealed())
+
+
+class EdgeResolver:
+    """
+    An endpoint on a line inside a multi-line statement is resolved to the
+    vertex of the statement, as _fetch_vertex_ids does, and dfg edges from a
+    call site to the definition it calls are reversed, as GremlinClient does.
+    Build it once the spans are sealed, and resolve dfg edges once the CG
+    tables are too, see can_resolve.
+    """
+
+    def __init__(self, keys: Container[str] = None) -> None:
+        """
+        :param keys: keys of the vertices written, if known
+        """
+        self.keys = keys
+        self.spans: SpanIndex = get_span_index()
+        # Fetched on the first dfg edge, once for all.
+        self.cg_index: CgIndex = None
+
+    def resolve_vertex(self, vertex: GraphVertex) -> str:
+        """
+        Return the key of the vertex written for the vertex, or None.
+        """
+        if self.keys is None:
+            return self.spans.owner_key(vertex)
+        if vertex.key in self.keys:
+            return vertex.key
+        owner = self.spans.owner_key(vertex)
+        return owner if owner in self.keys else None
+
+    def resolve(self, edge: GraphEdge) -> Tuple[str, str]:
+        """
+        Return the keys of the vertices the edge goes from and to, in the
+        direction it is written, or None if it can't be written.
+        """
+        if edge.from_v.is_invalid() or edge.to_v.is_invalid():
+            return None
+        from_key = self.resolve_vertex(edge.from_v)
+        to_key = self.resolve_vertex(edge.to_v)
+        if from_key is None or to_key is None:
+            return None
+        if edge.label != "dfg":
+            return from_key, to_key
+        if self.cg_index is None:
+            self.cg_index = get_cg_index()
+        if self.cg_index.is_call_to_definition(edge.from_v.key, edge.to_v.key):
+            return to_key, from_key
+        return from_key, to_key
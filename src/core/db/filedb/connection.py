@@ -7,6 +7,11 @@ from core.db.filedb.filedb_client import FileDbClient
 
 _VERTEX_FILE = None
 _EDGE_FILE = None
+_SHARDED = False
+_MERGE = True
+_FLUSH = "batch"
+_FSYNC = False
+_EDGE_FORMAT = "full"
 
 
 def resolve_filedb(section: dict):
@@ -14,13 +19,31 @@ def resolve_filedb(section: dict):
     FILEDB:
       VERTEX_FILE: "./tmp/vertex.json"
       EDGE_FILE: "./tmp/edge.json"
+      SHARDED: (true | false), optional, false by default
+      MERGE: (true | false), optional, true by default
+      FLUSH: (batch | close), optional, batch by default
+      FSYNC: (true | false), optional, false by default
+      EDGE_FORMAT: (full | compact), optional, full by default
     """
-    global _VERTEX_FILE, _EDGE_FILE
+    global _VERTEX_FILE, _EDGE_FILE, _SHARDED, _MERGE, _FLUSH, _FSYNC, _EDGE_FORMAT
     _VERTEX_FILE = section["VERTEX_FILE"]
     _EDGE_FILE = section["EDGE_FILE"]
+    _SHARDED = bool(section.get("SHARDED", False))
+    _MERGE = bool(section.get("MERGE", True))
+    _FLUSH = str(section.get("FLUSH", "batch")).lower()
+    _FSYNC = bool(section.get("FSYNC", False))
+    _EDGE_FORMAT = str(section.get("EDGE_FORMAT", "full")).lower()
 
 
 def get_filedb_client() -> FileDbClient:
     if _VERTEX_FILE is None or _EDGE_FILE is None:
         raise Exception("FileDB connection is not initialized")
-    return FileDbClient(_VERTEX_FILE, _EDGE_FILE)
+    return FileDbClient(
+        _VERTEX_FILE,
+        _EDGE_FILE,
+        _SHARDED,
+        _MERGE,
+        _FLUSH,
+        _FSYNC,
+        edge_format=_EDGE_FORMAT,
+    )
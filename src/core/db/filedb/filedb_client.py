@@ -2,14 +2,111 @@
 FileDB is a file-based database. It is used to store the graph data in a file.
 The main purpose of this class is to provide a way to validate the graph data
 when debugging on small graph on local machine. It should not be used in production.
+
+In sharded mode, each clone writes to shard files of its own through long-lived
+buffered handles, so that workers never wait for each other. The shards can be
+merged into the configured files when the prototype client is closed.
 """
 
+import glob
+import os
+import shutil
 import threading
 from typing import List
 from core.graph.graph import GraphEdge, GraphVertex
+from core.graph.serializer import (
+    EDGE_FORMATS,
+    edge_to_compact_json,
+    edge_to_json,
+    vertex_to_json,
+)
 from lib.shared.path_util import create_file, remove_file
 from core.db.client import DbClient
 
+# Guard appending to the same file from many clients in unsharded mode.
+_FILE_LOCKS = {}
+_FILE_LOCKS_LOCK = threading.Lock()
+
+# When shard files are flushed:
+#   batch: after every batch, so they are complete up to the last batch.
+#   close: only when the client is closed, the buffer size permitting.
+FLUSH_POLICIES = ("batch", "close")
+
+# Buffer size of each shard file handle.
+SHARD_BUFFER_SIZE = 1 << 20
+
+
+def _lock_of(file) -> threading.Lock:
+    with _FILE_LOCKS_LOCK:
+        return _FILE_LOCKS.setdefault(os.path.abspath(file), threading.Lock())
+
+
+def shard_of(file, index: int) -> str:
+    """
+    Path of the shard of the file, as "vertex.json" -> "vertex.3.json".
+    """
+    root, ext = os.path.splitext(file)
+    return f"{root}.{index}{ext}"
+
+
+def _shards_of(file) -> List[str]:
+    root, ext = os.path.splitext(file)
+    shards = glob.glob(f"{glob.escape(root)}.*{glob.escape(ext)}")
+    return [s for s in shards if s[len(root) + 1 : len(s) - len(ext)].isdigit()]
+
+
+class ShardWriter:
+    """
+    A long-lived buffered handle to a shard file, opened on first write.
+    """
+
+    def __init__(self, file, flush="batch", fsync=False) -> None:
+        self.file = file
+        self.flush_policy = flush
+        self.fsync = fsync
+        self._handle = None
+
+    def write_lines(self, lines):
+        if self._handle is None:
+            self._handle = open(
+                self.file, "a", encoding="utf-8", buffering=SHARD_BUFFER_SIZE
+            )
+        for line in lines:
+            self._handle.write(line)
+            self._handle.write("\n")
+        if self.flush_policy == "batch":
+            self.flush()
+
+    def flush(self):
+        if self._handle is None:
+            return
+        self._handle.flush()
+        if self.fsync:
+            os.fsync(self._handle.fileno())
+
+    def close(self):
+        if self._handle is None:
+            return
+        self.flush()
+        self._handle.close()
+        self._handle = None
+
+
+class ShardSet:
+    """
+    Shard indices handed out to a sharded client and its clones.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> int:
+        with self._lock:
+            index = self.count
+            self.count += 1
+            return index
+
 
 class FileDbClient(DbClient):
     """
@@ -17,15 +114,65 @@ class FileDbClient(DbClient):
     The format of the file is one compact JSON object per line.
     """
 
-    def __init__(self, vertex_file, edge_file) -> None:
+    def __init__(
+        self,
+        vertex_file,
+        edge_file,
+        sharded=False,
+        merge=True,
+        flush="batch",
+        fsync=False,
+        shards: ShardSet = None,
+        edge_format="full",
+    ) -> None:
+        """
+        :param sharded: if true, write to shard files of this client
+        :param merge: if true, merge the shards into the files when the
+            prototype client is closed
+        :param flush: when shard files are flushed, see FLUSH_POLICIES
+        :param fsync: if true, fsync shard files whenever they are flushed
+        :param shards: shard set shared with the prototype, None for a prototype
+        :param edge_format: how edges are written, see EDGE_FORMATS
+        """
         super().__init__()
         if vertex_file == edge_file:
             raise ValueError("Vertex file and edge file must be different.")
+        if flush not in FLUSH_POLICIES:
+            raise Exception(f"Flush policy {flush} is not supported.")
+        if edge_format not in EDGE_FORMATS:
+            raise Exception(f"Edge format {edge_format} is not supported.")
         self.vertex_file = vertex_file
         self.edge_file = edge_file
+        self.sharded = sharded
+        self.merge = merge
+        self.flush_policy = flush
+        self.fsync = fsync
+        self.edge_format = edge_format
+        self._edge_to_json = (
+            edge_to_compact_json if edge_format == "compact" else edge_to_json
+        )
+        self._is_prototype = shards is None
+        self.shards = ShardSet() if shards is None else shards
+        self.vertex_writer: ShardWriter = None
+        self.edge_writer: ShardWriter = None
+        if sharded:
+            index = self.shards.next()
+            self.vertex_writer = ShardWriter(
+                shard_of(vertex_file, index), flush, fsync
+            )
+            self.edge_writer = ShardWriter(shard_of(edge_file, index), flush, fsync)
 
     def clone(self):
-        return FileDbClient(self.vertex_file, self.edge_file)
+        return FileDbClient(
+            self.vertex_file,
+            self.edge_file,
+            self.sharded,
+            self.merge,
+            self.flush_policy,
+            self.fsync,
+            self.shards,
+            self.edge_format,
+        )
 
     def drop(self):
         """
@@ -33,42 +180,63 @@ class FileDbClient(DbClient):
         """
         remove_file(self.vertex_file)
         remove_file(self.edge_file)
+        for shard in _shards_of(self.vertex_file) + _shards_of(self.edge_file):
+            remove_file(shard)
 
     def init(self):
         self.drop()  # is this needed?
         create_file(self.vertex_file)
         create_file(self.edge_file)
 
+    def close(self):
+        """
+        Close the shard files. The prototype merges all shards, so it should
+        be closed after all of its clones.
+        """
+        if not self.sharded:
+            return
+        self.vertex_writer.close()
+        self.edge_writer.close()
+        if self._is_prototype and self.merge:
+            self._merge(self.vertex_file)
+            self._merge(self.edge_file)
+
+    def _merge(self, file):
+        with open(file, "ab") as dst:
+            for index in range(self.shards.count):
+                shard = shard_of(file, index)
+                if not os.path.exists(shard):
+                    continue
+                with open(shard, "rb") as src:
+                    shutil.copyfileobj(src, dst)
+                remove_file(shard)
+
+    def _append(self, file, writer: ShardWriter, lines):
+        if self.sharded:
+            writer.write_lines(lines)
+            return
+        with _lock_of(file):
+            with open(file, "a") as f:
+                for line in lines:
+                    f.write(line)
+                    f.write("\n")
+
     def add_vertex(self, vertex: GraphVertex):
-        lock = threading.Lock()
-        lock.acquire()
-        with open(self.vertex_file, "a") as f:
-            f.write(vertex.to_string(0))
-            f.write("\n")
-        lock.release()
+        self.add_vertex_bulk([vertex])
 
     def add_vertex_bulk(self, vertices: List[GraphVertex]):
-        lock = threading.Lock()
-        lock.acquire()
-        with open(self.vertex_file, "a") as f:
-            for vertex in vertices:
-                f.write(vertex.to_string(0))
-                f.write("\n")
-        lock.release()
+        self._append(
+            self.vertex_file,
+            self.vertex_writer,
+            (vertex_to_json(vertex) for vertex in vertices),
+        )
 
     def add_edge(self, edge: GraphEdge):
-        lock = threading.Lock()
-        lock.acquire()
-        with open(self.edge_file, "a") as f:
-            f.write(edge.to_string(0))
-            f.write("\n")
-        lock.release()
+        self.add_edge_bulk([edge])
 
     def add_edge_bulk(self, edges: List[GraphEdge]):
-        lock = threading.Lock()
-        lock.acquire()
-        with open(self.edge_file, "a") as f:
-            for edge in edges:
-                f.write(edge.to_string(0))
-                f.write("\n")
-        lock.release()
+        self._append(
+            self.edge_file,
+            self.edge_writer,
+            (self._edge_to_json(edge) for edge in edges),
+        )
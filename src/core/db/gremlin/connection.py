@@ -4,23 +4,41 @@ Gremlin server.
 """
 
 from gremlin_python.process.strategies import *
-from gremlin_python.driver.driver_remote_connection import DriverRemoteConnection
 from gremlin_python.driver.serializer import GraphSONMessageSerializer
-from gremlin_python.structure.graph import Graph, GraphTraversalSource
 from core.cache.cache_proxy import CacheProxy
 
 from core.db.gremlin.gremlin_client import GremlinClient
+from core.db.gremlin.pool import CONNECTION_POOL_SIZE, GremlinPool
 
-# Gremlin connection is a singleton?
-_GREMLIN_TRAVERSAL_SOURCE: GraphTraversalSource = None
+# Gremlin connection pool is a singleton.
+_GREMLIN_POOL: GremlinPool = None
+_BULK_MODE = "chain"
+_USER_ID = False
 
 
 def resolve_gremlin(section: dict):
     """
     GREMLIN:
       CONNECTION_STRING: "ws://ip:8182/gremlin"
+      BULK_MODE: (chain | inject), optional, chain by default
+      USER_ID: (true | false), optional, false by default
+      POOL_SIZE: <number of connections>, optional, 1 by default
+      MAX_WORKERS: <worker threads of each connection>, optional
+      CONNECTION_POOL_SIZE: <websockets of each connection>, optional, 8 by default
     """
-    _connect_gremlin(section["CONNECTION_STRING"])
+    global _BULK_MODE, _USER_ID
+    _BULK_MODE = str(section.get("BULK_MODE", "chain")).lower()
+    _USER_ID = bool(section.get("USER_ID", False))
+    _connect_gremlin(
+        section["CONNECTION_STRING"],
+        pool_size=int(section.get("POOL_SIZE", 1)),
+        max_workers=(
+            None if section.get("MAX_WORKERS") is None else int(section["MAX_WORKERS"])
+        ),
+        connection_pool_size=int(
+            section.get("CONNECTION_POOL_SIZE", CONNECTION_POOL_SIZE)
+        ),
+    )
 
 
 class DummyGraphSONSerializer(GraphSONMessageSerializer):
@@ -32,21 +50,27 @@ class DummyGraphSONSerializer(GraphSONMessageSerializer):
 
 
 def _connect_gremlin(
-    connection_string: str, traversal_source="g"
-) -> GraphTraversalSource:
+    connection_string: str,
+    traversal_source="g",
+    pool_size=1,
+    max_workers=None,
+    connection_pool_size=CONNECTION_POOL_SIZE,
+) -> GremlinPool:
     """
     This function is not thread safe. It should be called only once.
     """
-    global _GREMLIN_TRAVERSAL_SOURCE
-    if _GREMLIN_TRAVERSAL_SOURCE is None:
-        _GREMLIN_TRAVERSAL_SOURCE = (
-            Graph()
-            .traversal()
-            .withRemote(DriverRemoteConnection(connection_string, traversal_source))
+    global _GREMLIN_POOL
+    if _GREMLIN_POOL is None:
+        _GREMLIN_POOL = GremlinPool(
+            connection_string,
+            traversal_source,
+            pool_size,
+            max_workers,
+            connection_pool_size,
         )
     else:
         raise Exception("Gremlin connection is already initialized")
-    return _GREMLIN_TRAVERSAL_SOURCE
+    return _GREMLIN_POOL
 
 
 def get_gremlin_client(cache: CacheProxy) -> GremlinClient:
@@ -54,6 +78,8 @@ def get_gremlin_client(cache: CacheProxy) -> GremlinClient:
     Get a Gremlin client based on current configuration.
     This function should be called after resolve_gremlin.
     """
-    if _GREMLIN_TRAVERSAL_SOURCE is None:
+    if _GREMLIN_POOL is None:
         raise Exception("Gremlin connection is not initialized")
-    return GremlinClient(_GREMLIN_TRAVERSAL_SOURCE, cache)
+    return GremlinClient(
+        _GREMLIN_POOL.next(), cache, _BULK_MODE, _USER_ID, pool=_GREMLIN_POOL
+    )
@@ -2,20 +2,34 @@
 Gremlin client is a client for the Gremlin graph database.
 """
 
+import asyncio
 from time import sleep
-from typing import List, Tuple
+from aiohttp import ClientError
+from typing import Callable, Dict, List, Tuple
 from typing_extensions import deprecated
 from lib.shared.logger import logger
 from core.cache.cache_proxy import CacheProxy
-from core.graph.graph import GraphEdge, GraphVertex
+from core.graph.graph import GraphEdge, GraphVertex, vertex_id_of
 from core.db.client import DbClient
+from core.db.gremlin.pool import GremlinPool
+from gremlin_python.statics import long
 from gremlin_python.structure.graph import GraphTraversalSource
 from gremlin_python.process.graph_traversal import GraphTraversal
 from gremlin_python.process.graph_traversal import __
-from core.process.frontend.impl.cg_lib.cg_db import get_cg_db_transformed
+from gremlin_python.process.traversal import Column, P, T
+from core.process.frontend.impl.cfg_lib.span_db import (
+    SpanIndex,
+    get_span_index,
+    is_span_db_sealed,
+)
+from core.process.frontend.impl.cg_lib.cg_db import (
+    CgIndex,
+    get_cg_index,
+    is_cg_db_sealed,
+)
 
 
-@deprecated("This function has performance issue. Use _fetch_vertex_id instead.")
+@deprecated("This function has performance issue. Use _fetch_vertex_ids instead.")
 def _fetch_vertex_no_cache(g: GraphTraversal, v: GraphVertex):
     """
     We assume that the vertex is unique in the graph, and it
@@ -24,7 +38,7 @@ def _fetch_vertex_no_cache(g: GraphTraversal, v: GraphVertex):
     return g.has_label(v.label).has("key", v.key).next()
 
 
-@deprecated("This function has performance issue. Use _fetch_vertex_id instead.")
+@deprecated("This function has performance issue. Use _fetch_vertex_ids instead.")
 def _fetch_vertex(g: GraphTraversal, vertex: GraphVertex, cache: CacheProxy = None):
     """
     Fetch the vertex from the graph. Use cache if it is provided.
@@ -38,24 +52,101 @@ def _fetch_vertex(g: GraphTraversal, vertex: GraphVertex, cache: CacheProxy = No
     return v
 
 
-def _fetch_vertex_id(vertex: GraphVertex, cache: CacheProxy) -> int:
+def _fetch_vertex_ids(vertices: List[GraphVertex], cache: CacheProxy) -> Dict:
     """
-    Fetch the vertex ID from cache. If not found, raise StopIteration.
-    This function is mainly used in DFG construction. However, as we
-    folded multi-line statement, a miss in cache doesn't mean the vertex
-    is not in the graph. We need to check the above line numbers to find
-    the statement it belongs to.
+    Fetch the IDs of the vertices from cache, in at most two round trips.
+    This function is mainly used in DFG construction. However, as we folded
+    multi-line statement, a miss in cache doesn't mean the vertex is not in
+    the graph. The statement the line belongs to is found in the span index,
+    and looked up instead. Before the spans are sealed, misses are left
+    unresolved, as the seal may wait for this very batch through a bounded
+    pipe. Return the IDs found by vertex key.
     """
-    index = cache.get(vertex.key)
-    if index is None:
-        lineno = vertex.lineno
-        while lineno > 0:
-            index = cache.get(f"{vertex.props['file']}:{lineno}")
-            if index is not None:
-                return index
-            lineno = lineno - 1
-        raise StopIteration
-    return index
+    keys = list(dict.fromkeys(vertex.key for vertex in vertices))
+    found = {k: i for k, i in zip(keys, cache.get_many(keys)) if i is not None}
+    # vertex key -> key of the statement it belongs to
+    owners = {}
+    spans: SpanIndex = None
+    for vertex in vertices:
+        if vertex.key in found or vertex.key in owners:
+            continue
+        if spans is None:
+            if not is_span_db_sealed():
+                break
+            spans = get_span_index()
+        owner = spans.owner_key(vertex)
+        if owner is not None and owner != vertex.key:
+            owners[vertex.key] = owner
+    lookup = list(dict.fromkeys(owners.values()))
+    values = dict(zip(lookup, cache.get_many(lookup)))
+    for key, owner in owners.items():
+        if values[owner] is not None:
+            found[key] = values[owner]
+    return found
+
+
+def _cg_index_of(edges: List[GraphEdge]) -> CgIndex:
+    """
+    Return the CG index if any of the edges is a dfg edge, fetched once for
+    all of them. Other edges are written before the CG tables are sealed.
+    """
+    if any(edge.label == "dfg" for edge in edges):
+        return get_cg_index()
+    return None
+
+
+def _long_id(vertex_id):
+    """
+    GraphBinary sends Python ints as Int32, so send integer IDs as Long.
+    """
+    return long(vertex_id) if isinstance(vertex_id, int) else vertex_id
+
+
+def _first_of_each_id(vertices: List[GraphVertex]) -> List[GraphVertex]:
+    seen = set()
+    unique = []
+    for vertex in vertices:
+        if vertex.id not in seen:
+            seen.add(vertex.id)
+            unique.append(vertex)
+    return unique
+
+
+def _upsert_vertex(iterator, vertex: GraphVertex) -> GraphTraversal:
+    """
+    Chain the steps adding the vertex with its user ID, unless a vertex with
+    that ID exists already.
+    """
+    vertex_id = _long_id(vertex.id)
+    add = __.add_v(vertex.label).property(T.id, vertex_id)
+    if vertex.props is not None:
+        for k, v in vertex.props.items():
+            add = add.property(k, v)
+    return iterator.V(vertex_id).fold().coalesce(__.unfold(), add)
+
+
+async def _submit_async(traversal: GraphTraversal, finish: Callable = None):
+    """
+    Submit the traversal without blocking the event loop, and pass its
+    results to finish, or discard them if finish is None. Submitting waits
+    for a free websocket of the connection, so it is done in the default
+    executor of the loop, and so is finish, which may write to the cache.
+    """
+    if finish is None:
+        traversal = traversal.none()
+    future = await asyncio.get_running_loop().run_in_executor(
+        None, traversal.promise, lambda t: t.toList()
+    )
+    results = await asyncio.wrap_future(future)
+    if finish is not None:
+        await asyncio.to_thread(finish, results)
+
+
+# How bulk writes are sent to the server:
+#   chain: one chained step per element, the bytecode grows with the batch.
+#   inject: the batch is sent as data to a single traversal, so the bytecode
+#       and its compile cost on server stay the same regardless of batch size.
+BULK_MODES = ("chain", "inject")
 
 
 class GremlinClient(DbClient):
@@ -63,13 +154,50 @@ class GremlinClient(DbClient):
     Gremlin client for Neo4j-based Gremlin graph database.
     """
 
-    def __init__(self, g: GraphTraversalSource, cache: CacheProxy) -> None:
-        self.cache_cg_db_transformed = get_cg_db_transformed()
+    def __init__(
+        self,
+        g: GraphTraversalSource,
+        cache: CacheProxy,
+        bulk_mode="chain",
+        user_id=False,
+        pool: GremlinPool = None,
+    ) -> None:
+        """
+        :param user_id: if true, vertices are added with IDs derived from
+            their keys, so edges are written from keys alone without looking
+            up the cache. The database must accept user-supplied IDs.
+        :param pool: pool the connection of g is from, clones are bound to
+            the next connections of it, None to share g with clones
+        """
+        if bulk_mode not in BULK_MODES:
+            raise Exception(f"Bulk mode {bulk_mode} is not supported.")
         self._g: GraphTraversalSource = g
         self.cache: CacheProxy = cache
+        self.bulk_mode = bulk_mode
+        self.user_id = user_id
+        self.max_retry = 3
+        self.pool = pool
+        self._is_prototype = True
 
     def clone(self):
-        return GremlinClient(self._g, self.cache)
+        client = GremlinClient(
+            self._g if self.pool is None else self.pool.next(),
+            self.cache,
+            self.bulk_mode,
+            self.user_id,
+            self.pool,
+        )
+        client.set_retry(self.max_retry)
+        client._is_prototype = False
+        return client
+
+    def close(self):
+        """
+        The prototype closes all connections of the pool, so it should be
+        closed after all of its clones.
+        """
+        if self._is_prototype and self.pool is not None:
+            self.pool.close()
 
     def drop(self):
         """
@@ -84,7 +212,33 @@ class GremlinClient(DbClient):
         """
         pass
 
+    def related_files(self, file: str) -> List[str]:
+        related = []
+        related.extend(
+            self._g.V()
+            .hasLabel("file")
+            .has("file", file)
+            .out("related")
+            .values("file")
+            .toList()
+        )
+        related.extend(
+            self._g.V()
+            .hasLabel("file")
+            .has("file", file)
+            .in_("related")
+            .values("file")
+            .toList()
+        )
+        return related
+
+    def drop_file(self, file: str):
+        self._g.V().has("file", file).drop().iterate()
+
     def add_vertex(self, vertex: GraphVertex):
+        if self.user_id:
+            _upsert_vertex(self._g, vertex).iterate()
+            return
         iterator = self._g.add_v(vertex.label)
         if vertex.props is not None:
             for k, v in vertex.props.items():
@@ -93,9 +247,37 @@ class GremlinClient(DbClient):
         self.cache.set(vertex.key, index)
 
     def add_vertex_bulk(self, vertices: List[GraphVertex]):
+        traversal, finish = self._vertex_bulk_traversal(vertices)
+        if finish is None:
+            traversal.iterate()
+        else:
+            finish(traversal.toList())
+
+    async def add_vertex_bulk_async(self, vertices: List[GraphVertex]):
+        traversal, finish = self._vertex_bulk_traversal(vertices)
+        await _submit_async(traversal, finish)
+
+    def _vertex_bulk_traversal(
+        self, vertices: List[GraphVertex]
+    ) -> Tuple[GraphTraversal, Callable]:
+        """
+        Return the traversal adding the vertices, and the function to take
+        its results. It retrieves the indices of the vertices added, and
+        stores them in cache to speed up the process to add edges. With
+        user IDs, there is nothing to retrieve, and the function is None.
+        """
+        if self.user_id:
+            return self._vertex_bulk_with_id_traversal(vertices), None
+        if self.bulk_mode == "inject":
+            return self._vertex_bulk_inject_traversal(vertices), self._take_inject_ids
+        traversal, as_list = self._vertex_bulk_chain_traversal(vertices)
+        return traversal, lambda results: self._take_chain_ids(results, as_list)
+
+    def _vertex_bulk_chain_traversal(
+        self, vertices: List[GraphVertex]
+    ) -> Tuple[GraphTraversal, List[str]]:
         """
         Using select can retrieve the indices of the vertices added.
-        Storing them in cache can speed up the process to add edges.
         """
         iterator = self._g
         i = 0
@@ -108,50 +290,225 @@ class GremlinClient(DbClient):
             iterator.id_().as_(vertex.key)
             as_list.append(vertex.key)
             i = i + 1
-        index_dict = iterator.select(*as_list).toList()[0]
+        return iterator.select(*as_list), as_list
+
+    def _take_chain_ids(self, results: list, as_list: List[str]):
+        index_dict = results[0]
         # FIXME: It is strange that in some cases, index_dict will be
         # an integer, so we add a check here.
         if isinstance(index_dict, int):
             index_dict = {as_list[0]: index_dict}
-        for k, v in index_dict.items():
-            self.cache.set(k, v)
+        self.cache.set_many(index_dict)
 
-    def _add_single_edge(
-        self, it: GraphTraversal, edge: GraphEdge
-    ) -> Tuple[GraphTraversal, bool]:
-        try:
-            _from_id = _fetch_vertex_id(edge.from_v, self.cache)
-        except StopIteration:
+    def _take_inject_ids(self, results: list):
+        self.cache.set_many({result["key"]: result["id"] for result in results})
+
+    def _vertex_bulk_inject_traversal(
+        self, vertices: List[GraphVertex]
+    ) -> GraphTraversal:
+        """
+        Send vertices as a list of maps, each unfolded into one addV, and
+        its properties set from the map. Return the key and id of each.
+        """
+        rows = [
+            {"label": vertex.label, "props": vertex.props or {"key": vertex.key}}
+            for vertex in vertices
+        ]
+        return (
+            self._g.inject(rows)
+            .unfold()
+            .as_("m")
+            .add_v(__.select("m").select("label"))
+            .as_("v")
+            .side_effect(
+                __.select("m")
+                .select("props")
+                .unfold()
+                .as_("kv")
+                .select("v")
+                .property(
+                    __.select("kv").by(Column.keys),
+                    __.select("kv").by(Column.values),
+                )
+            )
+            .project("key", "id")
+            .by(__.select("m").select("props").select("key"))
+            .by(__.id_())
+        )
+
+    def _vertex_bulk_with_id_traversal(
+        self, vertices: List[GraphVertex]
+    ) -> GraphTraversal:
+        """
+        Vertices may share a key, as the statements on one line do, and so
+        their ID. The server rejects the whole traversal if an ID is added
+        twice, so vertices are added once per ID in the batch, and only if
+        no vertex with that ID was added before.
+        """
+        vertices = _first_of_each_id(vertices)
+        if self.bulk_mode == "inject":
+            rows = [
+                {
+                    "id": _long_id(vertex.id),
+                    "sid": str(vertex.id),
+                    "label": vertex.label,
+                    "props": vertex.props or {"key": vertex.key},
+                }
+                for vertex in vertices
+            ]
+            # Same lookup of vertices by ID as _edge_bulk_inject_traversal.
+            return (
+                self._g.V(*{row["id"] for row in rows})
+                .group()
+                .by(__.id_().as_string())
+                .by(__.unfold())
+                .as_("vs")
+                .constant(rows)
+                .unfold()
+                .as_("m")
+                .not_(__.select("vs").select(__.select("m").select("sid")))
+                .add_v(__.select("m").select("label"))
+                .property(T.id, __.select("m").select("id"))
+                .as_("v")
+                .side_effect(
+                    __.select("m")
+                    .select("props")
+                    .unfold()
+                    .as_("kv")
+                    .select("v")
+                    .property(
+                        __.select("kv").by(Column.keys),
+                        __.select("kv").by(Column.values),
+                    )
+                )
+            )
+        iterator = self._g
+        for vertex in vertices:
+            iterator = _upsert_vertex(iterator, vertex)
+        return iterator
+
+    def _fetch_endpoint_ids(self, edges: List[GraphEdge]) -> Dict:
+        """
+        Fetch the IDs of the endpoints of all edges at once. With user IDs,
+        they are derived from the key of the statement each endpoint belongs
+        to, without looking up the cache.
+        """
+        vertices = [v for edge in edges for v in (edge.from_v, edge.to_v)]
+        if not self.user_id:
+            return _fetch_vertex_ids(vertices, self.cache)
+        spans = get_span_index()
+        ids = {}
+        for vertex in vertices:
+            owner = spans.owner_key(vertex)
+            if owner is not None:
+                ids[vertex.key] = _long_id(vertex_id_of(owner))
+        return ids
+
+    def _resolve_edge(
+        self, edge: GraphEdge, ids: Dict, cg_index: CgIndex
+    ) -> Tuple[int, int]:
+        """
+        Return the IDs of the vertices the edge goes from and to, in the
+        direction it is written, given IDs from _fetch_endpoint_ids and the
+        index from _cg_index_of. Return None if any of them is missing.
+        """
+        _from_id = ids.get(edge.from_v.key, None)
+        if _from_id is None:
             logger().error(f"Missing vertex: {edge.from_v}")
-            return it, False
-        try:
-            _to_id = _fetch_vertex_id(edge.to_v, self.cache)
-        except StopIteration:
+            return None
+        _to_id = ids.get(edge.to_v.key, None)
+        if _to_id is None:
             logger().error(f"Missing vertex: {edge.to_v}")
+            return None
+        # A dfg edge from a call site to the definition it calls is reversed.
+        if edge.label == "dfg" and cg_index.is_call_to_definition(
+            edge.from_v.key, edge.to_v.key
+        ):
+            return _to_id, _from_id
+        return _from_id, _to_id
+
+    def _add_single_edge(
+        self, it: GraphTraversal, edge: GraphEdge, ids: Dict, cg_index: CgIndex
+    ) -> Tuple[GraphTraversal, bool]:
+        resolved = self._resolve_edge(edge, ids, cg_index)
+        if resolved is None:
             return it, False
-        # print(f"self.cache_cg_db: {self.cache_cg_db_transformed}")
-        if edge.label == "dfg" and edge.from_v.key in self.cache_cg_db_transformed["callee"] \
-                and edge.to_v.key in self.cache_cg_db_transformed["caller"] and \
-                set(self.cache_cg_db_transformed["callee"][edge.from_v.key]) & \
-                set(self.cache_cg_db_transformed["caller"][edge.to_v.key]):
-            iterator = it.add_e(edge.label).from_(__.V(_to_id)).to(__.V(_from_id))
-            # print(f"add edge: {edge.label} from {edge.from_v.key} to {edge.to_v.key}")
-        else:
-            iterator = it.add_e(edge.label).from_(__.V(_from_id)).to(__.V(_to_id))
+        _from_id, _to_id = resolved
+        if self.user_id:
+            # Either end may not exist, so add the edge in a side effect,
+            # which adds nothing instead of failing the whole traversal.
+            added = __.V(_from_id).as_("a").V(_to_id).add_e(edge.label).from_("a")
+            if edge.props is not None:
+                for k, v in edge.props.items():
+                    added = added.property(k, v)
+            return it.side_effect(added), True
+        iterator = it.add_e(edge.label).from_(__.V(_from_id)).to(__.V(_to_id))
         if edge.props is not None:
             for k, v in edge.props.items():
                 iterator = iterator.property(k, v)
         return iterator, True
 
+    def _edge_traversal(self) -> GraphTraversal:
+        """
+        The traversal to chain edges to. Edges chained as side effects
+        need a traverser to start with.
+        """
+        return self._g.inject(0) if self.user_id else self._g
+
+    def can_write_edge(self, edge: GraphEdge) -> bool:
+        """
+        The direction of dfg edges depends on the CG tables. With user IDs,
+        every endpoint is resolved by the spans of statements, so they
+        should be complete too.
+        """
+        if self.user_id and not is_span_db_sealed():
+            return False
+        return edge.label != "dfg" or is_cg_db_sealed()
+
     def add_edge(self, edge: GraphEdge):
-        iterator, status = self._add_single_edge(self._g, edge)
+        iterator, status = self._add_single_edge(
+            self._edge_traversal(),
+            edge,
+            self._fetch_endpoint_ids([edge]),
+            _cg_index_of([edge]),
+        )
         if status:
             iterator.iterate()
 
+    def set_retry(self, max_retry: int):
+        self.max_retry = max_retry
+
+    def may_have_written(self, error: Exception) -> bool:
+        """
+        The driver raises a RuntimeError when the connection is closed,
+        which says nothing about what the server committed.
+        """
+        return super().may_have_written(error) or isinstance(
+            error, (RuntimeError, ClientError)
+        )
+
+    def unwritten_vertices(self, vertices: List[GraphVertex]) -> List[GraphVertex]:
+        if self.user_id:
+            # Vertices are added only once per user ID, see _upsert_vertex.
+            return vertices
+        keys = list(dict.fromkeys(vertex.key for vertex in vertices))
+        found = {
+            result["key"]: result["id"]
+            for result in self._g.V()
+            .has("key", P.within(keys))
+            .project("key", "id")
+            .by(__.values("key"))
+            .by(__.id_())
+            .toList()
+        }
+        self.cache.set_many(found)
+        return [vertex for vertex in vertices if vertex.key not in found]
+
     def add_edge_bulk(self, edges: List[GraphEdge]):
-        self.cache_cg_db_transformed = get_cg_db_transformed()
-        # print(f"cache_cg_db: {self.cache_cg_db_transformed}")
-        max_retry = 3
+        if self.max_retry == 0:
+            self.add_edge_bulk_impl(edges)
+            return
+        max_retry = self.max_retry
         count = 0
         while count < max_retry:
             try:
@@ -167,22 +524,121 @@ class GremlinClient(DbClient):
             f"!!! Failed to add edge bulk after retrying {max_retry} times."
         )
 
+    async def add_edge_bulk_async(self, edges: List[GraphEdge]):
+        """
+        Same as add_edge_bulk, but without blocking the event loop. Endpoint
+        IDs are looked up in the cache in a thread.
+        """
+        max_retry = self.max_retry
+        count = 0
+        while True:
+            try:
+                traversal = await asyncio.to_thread(self._edge_bulk_traversal, edges)
+                if traversal is not None:
+                    await _submit_async(traversal)
+                return
+            except Exception as e:
+                if max_retry == 0:
+                    raise
+                count += 1
+                logger().warning(
+                    f"Error in add_edge_bulk_async {e}, retrying * {count}/{max_retry}"
+                )
+                if count >= max_retry:
+                    break
+                await asyncio.sleep(1)
+        logger().exception(
+            f"!!! Failed to add edge bulk after retrying {max_retry} times."
+        )
+
     def add_edge_bulk_impl(self, edges: List[GraphEdge]):
-        if len(edges) == 0:
-            return
-        iterator: GraphTraversal = self._g
-        can_iterate = False
+        traversal = self._edge_bulk_traversal(edges)
+        if traversal is not None:
+            traversal.iterate()
+
+    def _edge_bulk_traversal(self, edges: List[GraphEdge]) -> GraphTraversal:
+        """
+        Return the traversal adding the edges, or None if no edge is left
+        to add.
+        """
+        valid = []
         for edge in edges:
             # BUG: We didn't resolve line number missing issue here.
             #   so we need to skip the edge if any of the vertex has no line number.
             if edge.from_v.is_invalid() or edge.to_v.is_invalid():
                 logger().debug(f"Invalid edge: {edge.from_v} -> {edge.to_v}")
                 continue
-            iterator, status = self._add_single_edge(iterator, edge)
+            valid.append(edge)
+        if len(valid) == 0:
+            return None
+        ids = self._fetch_endpoint_ids(valid)
+        cg_index = _cg_index_of(valid)
+        if self.bulk_mode == "inject":
+            return self._edge_bulk_inject_traversal(valid, ids, cg_index)
+        iterator: GraphTraversal = self._edge_traversal()
+        can_iterate = False
+        for edge in valid:
+            iterator, status = self._add_single_edge(iterator, edge, ids, cg_index)
             if status:
                 can_iterate = True
-        if can_iterate:
-            iterator.iterate()
+        return iterator if can_iterate else None
+
+    def _edge_bulk_inject_traversal(
+        self, edges: List[GraphEdge], ids: Dict, cg_index: CgIndex
+    ) -> GraphTraversal:
+        """
+        Send edges as a list of maps holding the IDs of both ends. The
+        vertices are fetched once into a map by ID, and each edge looks its
+        ends up in it. IDs are compared as strings, as the server may send
+        back a different number type than the one sent. Looking up by a
+        traversal and asString() need TinkerPop 3.7+.
+        Edges with an end not found, possible with user IDs, are filtered
+        out.
+        """
+        rows = []
+        vertex_ids = set()
+        for edge in edges:
+            resolved = self._resolve_edge(edge, ids, cg_index)
+            if resolved is None:
+                continue
+            vertex_ids.update(_long_id(i) for i in resolved)
+            rows.append(
+                {
+                    "from": str(resolved[0]),
+                    "to": str(resolved[1]),
+                    "label": edge.label,
+                    "props": edge.props or {},
+                }
+            )
+        if len(rows) == 0:
+            return None
+        return (
+            self._g.V(*vertex_ids)
+            .group()
+            .by(__.id_().as_string())
+            .by(__.unfold())
+            .as_("vs")
+            .constant(rows)
+            .unfold()
+            .as_("r")
+            .filter_(__.select("vs").select(__.select("r").select("from")))
+            .filter_(__.select("vs").select(__.select("r").select("to")))
+            .add_e(__.select("r").select("label"))
+            .from_(__.select("vs").select(__.select("r").select("from")))
+            .to(__.select("vs").select(__.select("r").select("to")))
+            .as_("e")
+            .side_effect(
+                __.select("r")
+                .select("props")
+                .unfold()
+                .as_("kv")
+                .select("e")
+                .property(
+                    __.select("kv").by(Column.keys),
+                    __.select("kv").by(Column.values),
+                )
+            )
+        )
 
     def g(self):
         return self._g
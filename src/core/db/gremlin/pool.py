@@ -0,0 +1,71 @@
+"""
+A pool of connections to the Gremlin server, so that backend workers don't
+contend on one connection.
+"""
+
+import threading
+from typing import List
+from gremlin_python.driver.driver_remote_connection import DriverRemoteConnection
+from gremlin_python.structure.graph import Graph, GraphTraversalSource
+
+# Websockets of each connection by default, the same as the driver.
+CONNECTION_POOL_SIZE = 8
+
+
+class GremlinPool:
+    """
+    Connections are opened on first use, and handed out in turn, so that
+    each client of up to size clients is bound to a connection of its own.
+    """
+
+    def __init__(
+        self,
+        connection_string: str,
+        traversal_source="g",
+        size=1,
+        max_workers=None,
+        connection_pool_size=CONNECTION_POOL_SIZE,
+    ) -> None:
+        """
+        :param size: number of connections
+        :param max_workers: worker threads of each connection, see
+            DriverRemoteConnection
+        :param connection_pool_size: websockets of each connection, so that
+            up to size * connection_pool_size requests are in flight
+        """
+        self.connection_string = connection_string
+        self.traversal_source = traversal_source
+        self.size = max(1, size)
+        self.max_workers = max_workers
+        self.connection_pool_size = max(1, connection_pool_size)
+        self._connections: List[DriverRemoteConnection] = [None] * self.size
+        self._sources: List[GraphTraversalSource] = [None] * self.size
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> GraphTraversalSource:
+        """
+        Return the traversal source of the next connection.
+        """
+        with self._lock:
+            i = self._next
+            self._next = (i + 1) % self.size
+            if self._sources[i] is None:
+                connection = DriverRemoteConnection(
+                    self.connection_string,
+                    self.traversal_source,
+                    pool_size=self.connection_pool_size,
+                    max_workers=self.max_workers,
+                )
+                self._connections[i] = connection
+                self._sources[i] = Graph().traversal().withRemote(connection)
+            return self._sources[i]
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                if connection is not None:
+                    connection.close()
+            self._connections = [None] * self.size
+            self._sources = [None] * self.size
+            self._next = 0
@@ -0,0 +1,21 @@
+"""
+Connection definition for memory database.
+"""
+
+from core.db.memory.memory_client import MemoryClient
+
+
+_SNAPSHOT = None
+
+
+def resolve_memory(section: dict):
+    """
+    MEMORY:
+      SNAPSHOT: "./tmp/graph.pickle", optional, no snapshot by default
+    """
+    global _SNAPSHOT
+    _SNAPSHOT = (section or {}).get("SNAPSHOT", None)
+
+
+def get_memory_client() -> MemoryClient:
+    return MemoryClient(_SNAPSHOT)
@@ -0,0 +1,90 @@
+"""
+Memory database keeps the graph in the process, for short analysis jobs that
+query it right after building, and for running backends without a network.
+"""
+
+import os
+from typing import List
+from core.db.client import DbClient
+from core.db.edge_resolver import EdgeResolver, can_resolve
+from core.db.memory.memory_graph import MemoryGraph, load_snapshot
+from core.graph.graph import GraphEdge, GraphVertex
+from lib.shared.logger import logger
+from lib.shared.path_util import remove_file
+
+
+class MemoryClient(DbClient):
+    """
+    Memory client. Clones share the graph of the prototype, which writes a
+    snapshot of it when closed, if a snapshot file is given. Query the graph
+    through the graph attribute.
+    """
+
+    def __init__(self, snapshot=None, graph: MemoryGraph = None) -> None:
+        """
+        :param snapshot: file to load the graph from if it exists, and to
+            write the graph to when the prototype is closed
+        :param graph: graph shared with the prototype, None for a prototype
+        """
+        super().__init__()
+        self.snapshot = snapshot
+        self._is_prototype = graph is None
+        if graph is None:
+            if snapshot is not None and os.path.exists(snapshot):
+                logger().info(f"Loading memory graph snapshot from {snapshot}.")
+                graph = load_snapshot(snapshot)
+            else:
+                graph = MemoryGraph()
+        self.graph = graph
+
+    def clone(self):
+        return MemoryClient(self.snapshot, self.graph)
+
+    def drop(self):
+        self.graph.clear()
+        if self.snapshot is not None:
+            remove_file(self.snapshot)
+
+    def init(self):
+        """
+        Memory database need no initialization.
+        """
+        pass
+
+    def close(self):
+        if not self._is_prototype:
+            return
+        logger().info(
+            f"Memory graph has {self.graph.vertex_count()} vertices "
+            f"and {self.graph.edge_count()} edges."
+        )
+        if self.snapshot is not None:
+            self.graph.snapshot(self.snapshot)
+
+    def add_vertex(self, vertex: GraphVertex):
+        self.add_vertex_bulk([vertex])
+
+    def add_vertex_bulk(self, vertices: List[GraphVertex]):
+        self.graph.add_vertices(vertices)
+
+    def can_write_edge(self, edge: GraphEdge) -> bool:
+        return can_resolve(edge)
+
+    def add_edge(self, edge: GraphEdge):
+        self.add_edge_bulk([edge])
+
+    def add_edge_bulk(self, edges: List[GraphEdge]):
+        resolver = EdgeResolver(self.graph.index)
+        # label -> list of (from key, to key)
+        pairs = {}
+        skipped = 0
+        for edge in edges:
+            keys = resolver.resolve(edge)
+            if keys is None:
+                skipped += 1
+                continue
+            pairs.setdefault(edge.label, []).append(keys)
+        for label, keys in pairs.items():
+            self.graph.add_edges(label, keys)
+        if skipped > 0:
+            logger().warning(f"Skipped {skipped} edges with missing vertices.")
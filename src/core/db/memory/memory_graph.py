@@ -0,0 +1,236 @@
+"""
+A compact in-memory graph, queried in-process.
+
+Vertices are numbered in the order they are added. The label of each vertex
+is a code in an array, and each property is a column, a list over vertices
+with None for missing values. Edges of each label are kept as two arrays of
+source and target numbers, and are turned into CSR adjacency arrays in each
+direction on the first query after they change.
+
+A snapshot is a pickle of the columns and arrays, so only load snapshots
+you wrote yourself.
+"""
+
+import os
+import pickle
+import threading
+from array import array
+from collections import deque
+from typing import Dict, List, Tuple
+from core.db.csr.csr_client import to_csr
+from core.graph.graph import GraphVertex
+
+SNAPSHOT_VERSION = 1
+
+DIRECTIONS = ("out", "in", "both")
+
+
+class MemoryGraph:
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.keys: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.labels: List[str] = []
+        self.label_codes = array("B")
+        # name -> value of each vertex
+        self.columns: Dict[str, list] = {}
+        # label -> (sources, targets)
+        self.edges: Dict[str, Tuple[array, array]] = {}
+        # (label, direction) -> (offsets, targets), built on demand
+        self._adjacency = {}
+        # file -> vertex numbers, built on demand
+        self._by_file = None
+
+    def clear(self):
+        with self.lock:
+            self._reset()
+
+    def vertex_count(self) -> int:
+        return len(self.keys)
+
+    def edge_count(self, label: str = None) -> int:
+        with self.lock:
+            return sum(len(self.edges[l][0]) for l in self._labels_of(label))
+
+    def add_vertices(self, vertices: List[GraphVertex]):
+        """
+        A vertex added more than once keeps its first occurrence.
+        """
+        with self.lock:
+            count = len(self.keys)
+            for vertex in vertices:
+                if vertex.key in self.index:
+                    continue
+                i = len(self.keys)
+                self.index[vertex.key] = i
+                self.keys.append(vertex.key)
+                if vertex.label not in self.labels:
+                    if len(self.labels) > 0xFF:
+                        raise Exception("Too many vertex labels.")
+                    self.labels.append(vertex.label)
+                self.label_codes.append(self.labels.index(vertex.label))
+                for name, value in vertex.props.items():
+                    if name == "key":
+                        continue
+                    column = self.columns.get(name, None)
+                    if column is None:
+                        column = [None] * i
+                        self.columns[name] = column
+                    column.append(value)
+                for column in self.columns.values():
+                    if len(column) == i:
+                        column.append(None)
+            if len(self.keys) > count:
+                # Adjacency arrays are sized by the vertex count.
+                self._adjacency.clear()
+                self._by_file = None
+
+    def add_edges(self, label: str, pairs: List[Tuple[str, str]]):
+        """
+        Add edges of the label between vertices given by keys, which should
+        all be added already.
+        """
+        with self.lock:
+            sources, targets = self.edges.setdefault(
+                label, (array("q"), array("q"))
+            )
+            for from_key, to_key in pairs:
+                sources.append(self.index[from_key])
+                targets.append(self.index[to_key])
+            for direction in DIRECTIONS[:2]:
+                self._adjacency.pop((label, direction), None)
+
+    def vertex(self, key: str) -> dict:
+        """
+        Return the label and props of the vertex, or None if not found.
+        """
+        with self.lock:
+            i = self.index.get(key, None)
+            if i is None:
+                return None
+            props = {
+                name: column[i]
+                for name, column in self.columns.items()
+                if column[i] is not None
+            }
+            props["key"] = key
+            return {"label": self.labels[self.label_codes[i]], "props": props}
+
+    def neighbors(self, key: str, label: str = None, direction="out") -> List[str]:
+        """
+        Return the keys of the vertices linked to the vertex by edges of
+        the label, or of any label if None.
+        """
+        with self.lock:
+            i = self.index.get(key, None)
+            if i is None:
+                return []
+            return [self.keys[j] for j in self._neighbors(i, label, direction)]
+
+    def reachable(
+        self, key: str, label: str = None, direction="out", max_depth: int = None
+    ) -> List[str]:
+        """
+        Return the keys of the vertices reachable from the vertex by edges
+        of the label, in breadth-first order, excluding the vertex itself
+        unless it is on a cycle.
+        """
+        with self.lock:
+            start = self.index.get(key, None)
+            if start is None:
+                return []
+            seen = set()
+            result = []
+            queue = deque([(start, 0)])
+            while queue:
+                i, depth = queue.popleft()
+                if max_depth is not None and depth >= max_depth:
+                    continue
+                for j in self._neighbors(i, label, direction):
+                    if j in seen:
+                        continue
+                    seen.add(j)
+                    result.append(self.keys[j])
+                    queue.append((j, depth + 1))
+            return result
+
+    def subgraph_by_file(self, file: str) -> Tuple[List[str], List[Tuple]]:
+        """
+        Return the keys of the vertices of the file, and the edges between
+        them as (label, from key, to key).
+        """
+        with self.lock:
+            if self._by_file is None:
+                self._by_file = {}
+                for i, f in enumerate(self.columns.get("file", [])):
+                    self._by_file.setdefault(f, []).append(i)
+            members = self._by_file.get(file, [])
+            member_set = set(members)
+            edges = []
+            for label in self.edges:
+                for i in members:
+                    for j in self._neighbors(i, label, "out"):
+                        if j in member_set:
+                            edges.append((label, self.keys[i], self.keys[j]))
+            return [self.keys[i] for i in members], edges
+
+    def _labels_of(self, label: str) -> List[str]:
+        if label is None:
+            return list(self.edges)
+        return [label] if label in self.edges else []
+
+    def _neighbors(self, i: int, label: str, direction: str):
+        if direction not in DIRECTIONS:
+            raise Exception(f"Direction {direction} is not supported.")
+        directions = DIRECTIONS[:2] if direction == "both" else (direction,)
+        for label in self._labels_of(label):
+            for direction in directions:
+                offsets, targets = self._adjacency_of(label, direction)
+                yield from targets[offsets[i] : offsets[i + 1]]
+
+    def _adjacency_of(self, label: str, direction: str):
+        adjacency = self._adjacency.get((label, direction), None)
+        if adjacency is None:
+            sources, targets = self.edges[label]
+            if direction == "in":
+                sources, targets = targets, sources
+            adjacency = to_csr(len(self.keys), sources, targets)
+            self._adjacency[(label, direction)] = adjacency
+        return adjacency
+
+    def snapshot(self, file):
+        """
+        Write the graph to the file, replacing it at once.
+        """
+        with self.lock:
+            data = {
+                "version": SNAPSHOT_VERSION,
+                "keys": self.keys,
+                "labels": self.labels,
+                "label_codes": self.label_codes,
+                "columns": self.columns,
+                "edges": self.edges,
+            }
+            os.makedirs(os.path.dirname(os.path.abspath(file)), exist_ok=True)
+            temp = f"{file}.tmp"
+            with open(temp, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, file)
+
+
+def load_snapshot(file) -> MemoryGraph:
+    with open(file, "rb") as f:
+        data = pickle.load(f)
+    if data.get("version", None) != SNAPSHOT_VERSION:
+        raise Exception(f"Snapshot version {data.get('version')} is not supported.")
+    graph = MemoryGraph()
+    graph.keys = data["keys"]
+    graph.index = {key: i for i, key in enumerate(graph.keys)}
+    graph.labels = data["labels"]
+    graph.label_codes = data["label_codes"]
+    graph.columns = data["columns"]
+    graph.edges = data["edges"]
+    return graph
@@ -0,0 +1,23 @@
+"""
+Connection definition for SQLite database.
+"""
+
+from core.db.sqlite.sqlite_client import SqliteClient
+
+
+_FILE = None
+
+
+def resolve_sqlite(section: dict):
+    """
+    SQLITE:
+      FILE: "./tmp/graph.db"
+    """
+    global _FILE
+    _FILE = section["FILE"]
+
+
+def get_sqlite_client() -> SqliteClient:
+    if _FILE is None:
+        raise Exception("SQLite connection is not initialized")
+    return SqliteClient(_FILE)
@@ -0,0 +1,172 @@
+"""
+SQLite database stores the graph in a single local file, in two tables:
+
+    vertex(key, label, file, lineno, props)
+    edge(label, from_key, to_key, props)
+
+Edges refer to vertices by key, so no vertex ID is looked up in the cache.
+Vertices are indexed by key and file, and edges by both endpoints, so the
+vertices and edges of a file can be dropped to apply diff. Props are kept
+as JSON, which can be queried with the JSON functions of SQLite.
+
+The database is in WAL mode, so it can be read while being written. Each
+client has a connection of its own, and writes a batch in one transaction.
+"""
+
+import os
+import sqlite3
+from typing import List
+from core.db.client import DbClient
+from core.db.edge_resolver import EdgeResolver, can_resolve
+from core.graph.graph import GraphEdge, GraphVertex
+from core.graph.serializer import props_to_json
+from lib.shared.logger import logger
+from lib.shared.path_util import remove_file
+
+# Seconds to wait for the write lock held by another client.
+SQLITE_TIMEOUT = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vertex (
+    key TEXT PRIMARY KEY,
+    label TEXT NOT NULL,
+    file TEXT,
+    lineno INTEGER,
+    props TEXT
+);
+CREATE INDEX IF NOT EXISTS vertex_file ON vertex (file);
+CREATE TABLE IF NOT EXISTS edge (
+    label TEXT NOT NULL,
+    from_key TEXT NOT NULL,
+    to_key TEXT NOT NULL,
+    props TEXT
+);
+CREATE INDEX IF NOT EXISTS edge_from_key ON edge (from_key);
+CREATE INDEX IF NOT EXISTS edge_to_key ON edge (to_key);
+"""
+
+# A vertex written more than once keeps its first occurrence.
+_INSERT_VERTEX = (
+    "INSERT OR IGNORE INTO vertex (key, label, file, lineno, props) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+# An edge is only written if both of its endpoints are.
+_INSERT_EDGE = (
+    "INSERT INTO edge (label, from_key, to_key, props) SELECT ?, ?, ?, ? "
+    "WHERE EXISTS (SELECT 1 FROM vertex WHERE key = ?) "
+    "AND EXISTS (SELECT 1 FROM vertex WHERE key = ?)"
+)
+
+
+class SqliteClient(DbClient):
+    """
+    SQLite client. Connects on first use, so that clones can be created in
+    one thread and used in another.
+    """
+
+    def __init__(self, file) -> None:
+        super().__init__()
+        self.file = file
+        self._conn: sqlite3.Connection = None
+
+    def clone(self):
+        return SqliteClient(self.file)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.file)), exist_ok=True)
+            self._conn = sqlite3.connect(
+                self.file, timeout=SQLITE_TIMEOUT, check_same_thread=False
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Safe from corruption in WAL mode, only the last commits may
+            # be lost on power failure.
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def drop(self):
+        """
+        This may not be thread safe.
+        """
+        self.close()
+        for suffix in ("", "-wal", "-shm"):
+            remove_file(self.file + suffix)
+
+    def init(self):
+        self._connect()
+
+    def close(self):
+        if self._conn is None:
+            return
+        self._conn.close()
+        self._conn = None
+
+    def add_vertex(self, vertex: GraphVertex):
+        self.add_vertex_bulk([vertex])
+
+    def add_vertex_bulk(self, vertices: List[GraphVertex]):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                _INSERT_VERTEX,
+                (
+                    (
+                        vertex.key,
+                        vertex.label,
+                        vertex.props.get("file", None),
+                        vertex.props.get("lineno", None),
+                        props_to_json(vertex.props),
+                    )
+                    for vertex in vertices
+                ),
+            )
+
+    def can_write_edge(self, edge: GraphEdge) -> bool:
+        return can_resolve(edge)
+
+    def add_edge(self, edge: GraphEdge):
+        self.add_edge_bulk([edge])
+
+    def add_edge_bulk(self, edges: List[GraphEdge]):
+        resolver = EdgeResolver()
+        rows = []
+        for edge in edges:
+            keys = resolver.resolve(edge)
+            if keys is None:
+                continue
+            from_key, to_key = keys
+            props = None if edge.props is None else props_to_json(edge.props)
+            rows.append((edge.label, from_key, to_key, props, from_key, to_key))
+        conn = self._connect()
+        with conn:
+            written = conn.executemany(_INSERT_EDGE, rows).rowcount
+        if written < len(edges):
+            logger().warning(
+                f"Skipped {len(edges) - written} edges with missing vertices."
+            )
+
+    def related_files(self, file: str) -> List[str]:
+        """
+        The key of a file vertex is its file.
+        """
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT to_key FROM edge WHERE label = 'related' AND from_key = ? "
+            "UNION ALL "
+            "SELECT from_key FROM edge WHERE label = 'related' AND to_key = ?",
+            (file, file),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def drop_file(self, file: str):
+        conn = self._connect()
+        with conn:
+            for column in ("from_key", "to_key"):
+                conn.execute(
+                    f"DELETE FROM edge WHERE {column} IN "
+                    "(SELECT key FROM vertex WHERE file = ?)",
+                    (file,),
+                )
+            conn.execute("DELETE FROM vertex WHERE file = ?", (file,))
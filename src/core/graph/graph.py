@@ -4,9 +4,19 @@ It is a concept for frontend only, used for graph generation.
 The backend database won't rely on this class.
 """
 
+import hashlib
 from lib.shared.utils import obj_dumps
 
 
+def vertex_id_of(key: str) -> int:
+    """
+    Derive a positive 63-bit integer ID from the key of a vertex, so that
+    it fits in a signed long on any database.
+    """
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
 class GraphNode:
     """
     Base class for all nodes in the graph.
@@ -46,6 +56,14 @@ class GraphVertex(GraphNode):
     def lineno(self):
         return self.props.get("lineno", 0)
 
+    @property
+    def id(self) -> int:
+        """
+        A deterministic ID derived from the key, for databases that accept
+        user-supplied IDs.
+        """
+        return vertex_id_of(self.key)
+
     def generate_pseudo_key(self, lineno: int):
         """
         This is used in DFG, where the actual line number may not be available.
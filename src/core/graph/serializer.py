@@ -0,0 +1,58 @@
+"""
+Fast JSON serialization of vertices and edges, one compact object per line.
+
+GraphNode.to_string encodes through a JSON encoder subclass that turns every
+object into its __dict__. Here plain dicts are built directly and handed to a
+single shared encoder, so no encoder is created and no object is dispatched
+per call.
+"""
+
+import json
+from core.graph.graph import GraphEdge, GraphVertex
+
+_encode = json.JSONEncoder().encode
+
+# How edges are serialized:
+#   full: both endpoints are embedded as whole vertices, like to_string.
+#   compact: only the keys of both endpoints, as from_key and to_key.
+EDGE_FORMATS = ("full", "compact")
+
+
+def _vertex_dict(vertex: GraphVertex) -> dict:
+    return {"label": vertex.label, "props": vertex.props, "key": vertex.key}
+
+
+def vertex_to_json(vertex: GraphVertex) -> str:
+    """
+    Same as vertex.to_string(0).
+    """
+    return _encode(_vertex_dict(vertex))
+
+
+def edge_to_json(edge: GraphEdge) -> str:
+    """
+    Same as edge.to_string(0).
+    """
+    return _encode(
+        {
+            "label": edge.label,
+            "props": edge.props,
+            "from_v": _vertex_dict(edge.from_v),
+            "to_v": _vertex_dict(edge.to_v),
+        }
+    )
+
+
+def props_to_json(props: dict) -> str:
+    return _encode(props)
+
+
+def edge_to_compact_json(edge: GraphEdge) -> str:
+    return _encode(
+        {
+            "label": edge.label,
+            "from_key": edge.from_v.key,
+            "to_key": edge.to_v.key,
+            "props": edge.props,
+        }
+    )
@@ -1,6 +1,9 @@
+import asyncio
 import threading
 import time
 from core.db.client import DbClient
+from core.graph.graph import GraphEdge
+from core.process.backend.batch_size import AdaptiveBatchSize, FixedBatchSize
 from core.process.collector import Collector
 from core.process.process import ProcessDescriptor
 from lib.shared.logger import logger
@@ -9,6 +12,12 @@ from lib.shared.task_util import Task
 # Each worker should at least have 64 vertices or edges to process.
 MINIMAL_TASK_COUNT = 64
 
+# Number of edges the streaming router takes from the source at a time.
+ROUTER_BATCH_SIZE = 256
+
+# Key under which edges rejected by DbClient.can_write_edge are parked.
+_BARRIER = None
+
 
 class BackendDescriptor(ProcessDescriptor):
     def __init__(
@@ -19,7 +28,19 @@ class BackendDescriptor(ProcessDescriptor):
         max_workers=0,
         vertex_batch_size=None,
         edge_batch_size=None,
+        streaming=False,
+        adaptive_batch=False,
+        async_window=0,
+        capacity=0,
     ) -> None:
+        """
+        :param adaptive_batch: if true, batch sizes start from the given ones
+            and adapt to the observed throughput and failures
+        :param async_window: if positive, write from an event loop instead
+            of threads, with up to this many batches in flight per client
+        :param capacity: if positive, in streaming mode, edges are no longer
+            taken from the source while this many are waiting to be written
+        """
         super().__init__(max_workers)
         self.client: DbClient = client
         self.source: Collector.Source = source
@@ -30,8 +51,41 @@ class BackendDescriptor(ProcessDescriptor):
         self.edge_batch_size = (
             None if edge_batch_size is None else max(1, edge_batch_size)
         )
+        self.streaming = streaming
+        self.async_window = max(0, async_window)
+        if self.async_window > 0 and adaptive_batch:
+            logger().warning("Adaptive batch size is not supported in async mode.")
+            adaptive_batch = False
+        batch_size_type = AdaptiveBatchSize if adaptive_batch else FixedBatchSize
+        self.vertex_batch = batch_size_type(
+            "vertex",
+            self.batch_size
+            if self.vertex_batch_size is None
+            else self.vertex_batch_size,
+            client.may_have_written,
+            client.unwritten_vertices,
+        )
+        self.edge_batch = batch_size_type(
+            "edge",
+            self.batch_size if self.edge_batch_size is None else self.edge_batch_size,
+            client.may_have_written,
+        )
+        # Let failures reach the adaptive batch size instead of being retried.
+        if adaptive_batch:
+            self.client.set_retry(0)
+        # States for streaming mode, see _process_streaming.
+        self.capacity = max(0, capacity)
+        self._ready = Collector(0, self.capacity)
+        self._written = set()
+        self._parked = {}
+        self._vertices_done = False
+        self._lock = threading.Lock()
 
     def get_process(self) -> Task:
+        if self.async_window > 0:
+            return Task(self._process_async)
+        if self.streaming:
+            return Task(self._process_streaming)
         return Task(self._process)
 
     def _process(self):
@@ -52,6 +106,7 @@ class BackendDescriptor(ProcessDescriptor):
             workers.append(worker)
         for worker in workers:
             worker.join()
+        self.vertex_batch.summary()
 
         # Optional sleep to let vertices be indexed.
         # time.sleep(1)
@@ -66,70 +121,284 @@ class BackendDescriptor(ProcessDescriptor):
         for i in range(worker_count):
             worker = threading.Thread(
                 target=self._edge_worker,
-                args=(f"No.{i}", clients[i]),
+                args=(f"No.{i}", clients[i], self.source),
             )
             worker.start()
             workers.append(worker)
         for worker in workers:
             worker.join()
+        self.edge_batch.summary()
+        self._close(clients)
+
+    def _process_streaming(self):
+        """
+        Add vertices and edges at the same time. An edge is routed to the edge
+        workers as soon as both of its endpoints are written, and is parked
+        under the first missing endpoint until then. Once the vertex stream
+        ends, all parked edges are released, as some endpoints are never
+        written under their own key (see _fetch_vertex_ids). Only the router
+        waits for room in the ready edges, see _edge_router.
+        """
+        clients = [self.client] + [
+            self.client.clone() for _ in range(2 * self.max_workers - 1)
+        ]
+        vertex_workers = []
+        edge_workers = []
+        for i in range(self.max_workers):
+            vertex_workers.append(
+                threading.Thread(
+                    target=self._vertex_worker,
+                    args=(f"No.{i}", clients[i]),
+                )
+            )
+            edge_workers.append(
+                threading.Thread(
+                    target=self._edge_worker,
+                    args=(
+                        f"No.{i}",
+                        clients[self.max_workers + i],
+                        self._ready.as_source(),
+                    ),
+                )
+            )
+        router = threading.Thread(target=self._edge_router)
+        for worker in vertex_workers + edge_workers + [router]:
+            worker.start()
+
+        for worker in vertex_workers:
+            worker.join()
+        self.vertex_batch.summary()
+        self._release_all()
+        router.join()
+        self._ready.as_sink().seal_edge()
+        for worker in edge_workers:
+            worker.join()
+        self.edge_batch.summary()
+        self._close(clients)
+
+    def _process_async(self):
+        """
+        Write from a single event loop, with async_window batches in flight
+        on each of max_workers clients. Vertices and edges are written in
+        any order, except that an edge waits for its endpoints: for all
+        vertices, or in streaming mode, as routed by _edge_router.
+        """
+        asyncio.run(self._run_async())
+
+    async def _run_async(self):
+        clients = [self.client] + [
+            self.client.clone() for _ in range(self.max_workers - 1)
+        ]
+        windows = [asyncio.Semaphore(self.async_window) for _ in clients]
+        vertices = self._pump_async(
+            clients,
+            windows,
+            self.source.get_vertex_batch,
+            self.vertex_batch,
+            self._add_vertex_batch_async,
+        )
+        if not self.streaming:
+            await vertices
+            self.vertex_batch.summary()
+            await self._pump_async(
+                clients,
+                windows,
+                self.source.get_edge_batch,
+                self.edge_batch,
+                self._add_edge_batch_async,
+            )
+        else:
+            router = threading.Thread(target=self._edge_router)
+            router.start()
+            edges = asyncio.create_task(
+                self._pump_async(
+                    clients,
+                    windows,
+                    self._ready.as_source().get_edge_batch,
+                    self.edge_batch,
+                    self._add_edge_batch_async,
+                )
+            )
+            await vertices
+            self.vertex_batch.summary()
+            self._release_all()
+            await asyncio.to_thread(router.join)
+            self._ready.as_sink().seal_edge()
+            await edges
+        self.edge_batch.summary()
+        self._close(clients)
+
+    async def _pump_async(self, clients, windows, get_batch, batch_size, write):
+        """
+        Take batches from the source in a thread, as taking may block, and
+        hand them to the writers of all clients.
+        """
+        queue = asyncio.Queue(len(clients) * self.async_window)
+        writers = [
+            asyncio.create_task(self._write_async(client, window, queue, write))
+            for client, window in zip(clients, windows)
+            for _ in range(self.async_window)
+        ]
+        batch = []
+        while True:
+            items = await asyncio.to_thread(
+                get_batch, max(1, batch_size.get() - len(batch))
+            )
+            if len(items) == 0:
+                break
+            batch.extend(items)
+            if len(batch) >= batch_size.get():
+                await queue.put(batch)
+                batch = []
+        if len(batch) > 0:
+            await queue.put(batch)
+        for _ in writers:
+            await queue.put(None)
+        await asyncio.gather(*writers)
+
+    async def _write_async(self, client: DbClient, window, queue, write):
+        """
+        Write batches from the queue until None. The window of the client is
+        shared by vertex and edge writers in streaming mode. Failed writes
+        are handled by the batch size as in threads, so anything raised here
+        is a bug, and the writer goes on with the next batch.
+        """
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            async with window:
+                try:
+                    await write(client, batch)
+                except Exception:
+                    logger().exception(f"Failed to write a batch of {len(batch)}.")
+
+    async def _add_vertex_batch_async(self, client: DbClient, batch):
+        logger().info(f"Adding {len(batch)} vertices.")
+        await self.vertex_batch.write_async(client.add_vertex_bulk_async, batch)
+        if self.streaming:
+            self._on_vertices_written(batch)
+
+    async def _add_edge_batch_async(self, client: DbClient, batch):
+        logger().info(f"Adding {len(batch)} edges.")
+        await self.edge_batch.write_async(client.add_edge_bulk_async, batch)
+
+    def _close(self, clients):
+        """
+        Close the clones first, as closing the prototype may depend on them.
+        """
+        for client in clients:
+            if client is not self.client:
+                client.close()
+        self.client.close()
+
+    def _edge_router(self):
+        logger().debug("Backend edge router started...")
+        while True:
+            edges = self.source.get_edge_batch(
+                ROUTER_BATCH_SIZE
+                if self.capacity == 0
+                else min(ROUTER_BATCH_SIZE, self.capacity)
+            )
+            if len(edges) == 0:
+                break
+            ready = []
+            with self._lock:
+                for edge in edges:
+                    self._route(edge, ready)
+            # Wait for room outside the lock, so that vertex workers keep
+            # re-routing parked edges. Edges re-routed by them never wait,
+            # as parked edges only drain as vertices are written.
+            self._ready.as_sink().put_edges(ready)
+        logger().debug("Backend edge router finished...")
+
+    def _route(self, edge: GraphEdge, ready: list):
+        """
+        Park the edge, or append it to ready if it can be written. Should be
+        called with self._lock held.
+        """
+        if self._vertices_done:
+            ready.append(edge)
+            return
+        for vertex in (edge.from_v, edge.to_v):
+            if vertex.key not in self._written:
+                self._parked.setdefault(vertex.key, []).append(edge)
+                return
+        if not self.client.can_write_edge(edge):
+            self._parked.setdefault(_BARRIER, []).append(edge)
+            return
+        ready.append(edge)
+
+    def _on_vertices_written(self, vertices):
+        """
+        Re-route the edges parked under the written vertices. Edges parked
+        by the client are re-routed as a whole once the first of them can
+        be written, to avoid scanning all of them on every batch.
+        """
+        with self._lock:
+            released = []
+            for vertex in vertices:
+                self._written.add(vertex.key)
+                released.extend(self._parked.pop(vertex.key, []))
+            barrier = self._parked.get(_BARRIER)
+            if barrier and self.client.can_write_edge(barrier[0]):
+                released.extend(self._parked.pop(_BARRIER))
+            ready = []
+            for edge in released:
+                self._route(edge, ready)
+            self._ready.as_sink().put_edges(ready, block=False)
+
+    def _release_all(self):
+        with self._lock:
+            self._vertices_done = True
+            for edges in self._parked.values():
+                self._ready.as_sink().put_edges(edges, block=False)
+            self._parked.clear()
+            self._written.clear()
 
     def _vertex_worker(self, name, client: DbClient):
         logger().debug(f"Backend worker {name} started to add vertices...")
 
         # adding vertices
-        batch_size = (
-            self.batch_size
-            if self.vertex_batch_size is None
-            else self.vertex_batch_size
-        )
-        count = 0
         batch = []
         while True:
-            vertex = self.source.get_vertex()
-            if vertex is None:
-                self.source.seal_vertex()
+            vertices = self.source.get_vertex_batch(
+                max(1, self.vertex_batch.get() - len(batch))
+            )
+            if len(vertices) == 0:
                 break
-            batch.append(vertex)
-            count = count + 1
-            if count == batch_size:
-                logger().info(f"Adding {count} vertices.")
-                client.add_vertex_bulk(batch)
+            batch.extend(vertices)
+            if len(batch) >= self.vertex_batch.get():
+                self._add_vertex_batch(client, batch)
                 batch = []
-                count = 0
-        if count > 0:
-            logger().info(f"Adding {count} vertices.")
-            client.add_vertex_bulk(batch)
-            batch = []
-            count = 0
+        if len(batch) > 0:
+            self._add_vertex_batch(client, batch)
 
         logger().debug(f"Backend worker {name} finished adding vertices...")
 
-    def _edge_worker(self, name, client: DbClient):
+    def _add_vertex_batch(self, client: DbClient, batch):
+        logger().info(f"Adding {len(batch)} vertices.")
+        self.vertex_batch.write(client.add_vertex_bulk, batch)
+        if self.streaming:
+            self._on_vertices_written(batch)
+
+    def _edge_worker(self, name, client: DbClient, source: Collector.Source):
         logger().debug(f"Backend worker {name} started to add edges...")
 
         # adding edges
-        batch_size = (
-            self.batch_size if self.edge_batch_size is None else self.edge_batch_size
-        )
-        count = 0
         batch = []
         while True:
-            edge = self.source.get_edge()
-            if edge is None:
-                self.source.seal_edge()
+            edges = source.get_edge_batch(max(1, self.edge_batch.get() - len(batch)))
+            if len(edges) == 0:
                 break
-            batch.append(edge)
-            count = count + 1
-            if count == batch_size:
-                logger().info(f"Adding {count} edges.")
-                client.add_edge_bulk(batch)
+            batch.extend(edges)
+            if len(batch) >= self.edge_batch.get():
+                logger().info(f"Adding {len(batch)} edges.")
+                self.edge_batch.write(client.add_edge_bulk, batch)
                 batch = []
-                count = 0
-        if count > 0:
-            logger().info(f"Adding {count} edges.")
-            client.add_edge_bulk(batch)
-            batch = []
-            count = 0
+        if len(batch) > 0:
+            logger().info(f"Adding {len(batch)} edges.")
+            self.edge_batch.write(client.add_edge_bulk, batch)
 
         logger().debug(f"Backend worker {name} finished adding edges...")
 
@@ -141,7 +410,20 @@ def get_backend_descriptor(
     max_workers=0,
     vertex_batch_size=None,
     edge_batch_size=None,
+    streaming=False,
+    adaptive_batch=False,
+    async_window=0,
+    capacity=0,
 ):
     return BackendDescriptor(
-        client, source, batch_size, max_workers, vertex_batch_size, edge_batch_size
+        client,
+        source,
+        batch_size,
+        max_workers,
+        vertex_batch_size,
+        edge_batch_size,
+        streaming,
+        adaptive_batch,
+        async_window,
+        capacity,
     )
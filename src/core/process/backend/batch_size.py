@@ -0,0 +1,372 @@
+"""
+Batch size of backend workers, either fixed or adapted at runtime, and how
+their batches are written, from threads or from an event loop alike.
+
+A failed batch is split in halves and written again, until single items
+fail, which are logged, dropped and counted in the summary. Only items that
+surely were not written are written again, as writes are not idempotent in
+general. For a batch that may have been written, like one that timed out,
+the items written are looked up if possible, and the others are split and
+written again. Otherwise the batch is dropped as a whole.
+
+The adaptive one works in steps of a few batches at a size. It climbs by
+doubling the size as long as the throughput (items written per second of
+round trip) keeps improving, and settles on the best size seen once it
+doesn't. After a run of clean steps, it probes the double of the size again,
+as the conditions may have changed since.
+
+A batch that failed is too large if both of its halves succeed, or if it may
+have been written. Otherwise the failure is blamed on the items. If too many
+batches of a step are too large, the size is halved and capped there until
+the next probe, so oversized messages stop recurring, while a single one
+does not shrink the size for good. It is shared by all workers of the same
+kind.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, List
+from lib.shared.logger import logger
+
+# Upper bound of the adaptive batch size.
+MAX_ADAPTIVE_BATCH_SIZE = 8192
+
+# Number of batches written at a size before judging its throughput.
+SAMPLES_PER_STEP = 4
+
+# Relative throughput gain required to keep growing.
+MIN_GAIN = 0.1
+
+# Share of batches of a step that may be too large before the size shrinks.
+MAX_FAILURE_RATE = 0.25
+
+# Number of clean steps at the settled size before probing a larger one. It
+# doubles each time a probe turns out too large.
+RECOVERY_STEPS = 16
+
+
+def _call(write: Callable[[List], None], batch: List) -> Exception:
+    """
+    Return what the write raised, to be handled out of the except clause, so
+    that errors of writes again are not chained to it.
+    """
+    try:
+        write(batch)
+    except Exception as e:
+        return e
+    return None
+
+
+async def _call_async(
+    write: Callable[[List], Awaitable[None]], batch: List
+) -> Exception:
+    try:
+        await write(batch)
+    except Exception as e:
+        return e
+    return None
+
+
+class FixedBatchSize:
+    def __init__(
+        self,
+        name: str,
+        size: int,
+        may_have_written: Callable[[Exception], bool] = None,
+        find_unwritten: Callable[[List], List] = None,
+    ) -> None:
+        """
+        :param may_have_written: whether a write that raised the error may
+            have been written anyway, see DbClient.may_have_written
+        :param find_unwritten: the items of such a write that were not
+            written, or None if unknown, see DbClient.unwritten_vertices
+        """
+        self.name = name
+        self.size = max(1, size)
+        self._may_have_written = may_have_written or (lambda error: False)
+        self._find_unwritten = find_unwritten or (lambda batch: None)
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def get(self) -> int:
+        return self.size
+
+    def write(self, write: Callable[[List], None], batch: List) -> bool:
+        """
+        Write the batch, splitting it on failure until single items fail,
+        which are logged and dropped. Return whether nothing is dropped.
+        """
+        start = time.perf_counter()
+        error = _call(write, batch)
+        if error is not None:
+            return self._write_again(write, batch, error)
+        self._on_written(len(batch), time.perf_counter() - start)
+        return True
+
+    async def write_async(
+        self, write: Callable[[List], Awaitable[None]], batch: List
+    ) -> bool:
+        """
+        Same as write, for writes that are awaited.
+        """
+        start = time.perf_counter()
+        error = await _call_async(write, batch)
+        if error is not None:
+            return await self._write_again_async(write, batch, error)
+        self._on_written(len(batch), time.perf_counter() - start)
+        return True
+
+    def _write_again(
+        self, write: Callable[[List], None], batch: List, error: Exception
+    ) -> bool:
+        """
+        Write the batch that failed with the error again, in halves.
+        """
+        surely_failed = not self._may_have_written(error)
+        if not surely_failed:
+            batch = self._unwritten(batch, error)
+        halves = self._halves(batch, error)
+        if halves is None:
+            return False
+        succeeded = True
+        # Write both halves even if the first one fails.
+        for half in halves:
+            succeeded = self._write_split(write, half) and succeeded
+        if succeeded and surely_failed:
+            self._on_oversized(len(batch))
+        return succeeded
+
+    async def _write_again_async(
+        self, write: Callable[[List], Awaitable[None]], batch: List, error: Exception
+    ) -> bool:
+        surely_failed = not self._may_have_written(error)
+        if not surely_failed:
+            # Looking up the items may block.
+            batch = await asyncio.to_thread(self._unwritten, batch, error)
+        halves = self._halves(batch, error)
+        if halves is None:
+            return False
+        succeeded = True
+        for half in halves:
+            succeeded = await self._write_split_async(write, half) and succeeded
+        if succeeded and surely_failed:
+            self._on_oversized(len(batch))
+        return succeeded
+
+    def _write_split(self, write: Callable[[List], None], batch: List) -> bool:
+        """
+        Write part of a failed batch, which says nothing about the size.
+        """
+        error = _call(write, batch)
+        if error is not None:
+            return self._write_again(write, batch, error)
+        return True
+
+    async def _write_split_async(
+        self, write: Callable[[List], Awaitable[None]], batch: List
+    ) -> bool:
+        error = await _call_async(write, batch)
+        if error is not None:
+            return await self._write_again_async(write, batch, error)
+        return True
+
+    def _unwritten(self, batch: List, error: Exception) -> List:
+        """
+        Return the items of the batch that the write failed with the error
+        may not have written, or None if it can't be told.
+        """
+        if len(batch) > 1:
+            self._on_oversized(len(batch))
+        try:
+            unwritten = self._find_unwritten(batch)
+        except Exception as e:
+            logger().warning(f"Failed to look up {len(batch)} {self.name}: {e}")
+            unwritten = None
+        if unwritten is None:
+            logger().error(
+                f"Failed to write {len(batch)} {self.name}, not writing them "
+                f"again as they may be written already: {error}"
+            )
+            self._drop(len(batch))
+            return None
+        logger().warning(
+            f"Failed to write {len(batch)} {self.name}, writing the "
+            f"{len(unwritten)} not written again: {error}"
+        )
+        return unwritten
+
+    def _halves(self, batch: List, error: Exception) -> List[List]:
+        """
+        Return the parts of the batch failed with the error to write again,
+        or None if it is dropped.
+        """
+        if batch is None:
+            return None
+        if len(batch) == 0:
+            return []
+        if len(batch) == 1:
+            logger().error(
+                f"Failed to write {self.name} {batch[0]}: {error}", exc_info=error
+            )
+            self._drop(1)
+            return None
+        logger().warning(
+            f"Failed to write {len(batch)} {self.name} at once, splitting: {error}"
+        )
+        half = len(batch) // 2
+        return [batch[:half], batch[half:]]
+
+    def _drop(self, count):
+        with self._lock:
+            self._dropped += count
+
+    def summary(self):
+        with self._lock:
+            if self._dropped > 0:
+                logger().warning(
+                    f"Dropped {self._dropped} {self.name} that failed to be written."
+                )
+
+    def _on_written(self, count, elapsed):
+        pass
+
+    def _on_oversized(self, count):
+        pass
+
+
+class AdaptiveBatchSize(FixedBatchSize):
+    def __init__(
+        self,
+        name: str,
+        size: int,
+        may_have_written: Callable[[Exception], bool] = None,
+        find_unwritten: Callable[[List], List] = None,
+    ) -> None:
+        super().__init__(name, size, may_have_written, find_unwritten)
+        self._ceiling = MAX_ADAPTIVE_BATCH_SIZE
+        self._best_size = self.size
+        self._best_throughput = 0.0
+        self._settled = False
+        self._recovery_steps = RECOVERY_STEPS
+        self._clean_steps = 0
+        self._count = 0
+        self._elapsed = 0.0
+        self._samples = 0
+        self._step_failures = 0
+        self._failures = 0
+
+    def get(self) -> int:
+        with self._lock:
+            return self.size
+
+    def summary(self):
+        super().summary()
+        with self._lock:
+            logger().info(
+                f"Adaptive {self.name} batch size converged at {self.size} "
+                f"({self._best_throughput:.0f} items/s per worker, "
+                f"{self._failures} oversized batches)."
+            )
+
+    def _on_written(self, count, elapsed):
+        with self._lock:
+            if self._is_sample(count):
+                self._count += count
+                self._elapsed += elapsed
+                self._end_sample()
+
+    def _on_oversized(self, count):
+        with self._lock:
+            self._failures += 1
+            if self._is_sample(count):
+                self._step_failures += 1
+                self._end_sample()
+
+    def _is_sample(self, count):
+        """
+        Partial batches say little about the current size, and batches
+        larger than it were taken before it shrank.
+        """
+        return self.size // 2 <= count <= self.size
+
+    def _end_sample(self):
+        """
+        Should be called with self._lock held.
+        """
+        self._samples += 1
+        if self._samples < SAMPLES_PER_STEP:
+            return
+        throughput = self._count / self._elapsed if self._elapsed > 0 else 0.0
+        failure_rate = self._step_failures / self._samples
+        self._count, self._elapsed, self._samples = 0, 0.0, 0
+        self._step_failures = 0
+        if failure_rate > MAX_FAILURE_RATE:
+            self._shrink()
+        elif failure_rate > 0:
+            self._clean_steps = 0
+        elif self._settled:
+            self._clean_steps += 1
+            if self._clean_steps >= self._recovery_steps:
+                self._probe(throughput)
+        else:
+            self._climb(throughput)
+
+    def _climb(self, throughput):
+        """
+        Should be called with self._lock held.
+        """
+        if throughput > self._best_throughput * (1 + MIN_GAIN):
+            self._best_size = self.size
+            self._best_throughput = throughput
+            if self.size < self._ceiling:
+                self._resize(min(self._ceiling, self.size * 2))
+                return
+        else:
+            self._resize(self._best_size)
+        self._settled = True
+        self._clean_steps = 0
+        logger().info(f"Adaptive {self.name} batch size settled at {self.size}.")
+
+    def _probe(self, throughput):
+        """
+        Climb again from the settled size, lifting the ceiling, which the
+        failure rate sets again if the next size is still too large. Should
+        be called with self._lock held.
+        """
+        self._clean_steps = 0
+        if self.size >= MAX_ADAPTIVE_BATCH_SIZE:
+            return
+        # Judge the probe against the settled size as it performs now.
+        self._best_size = self.size
+        self._best_throughput = throughput
+        self._ceiling = MAX_ADAPTIVE_BATCH_SIZE
+        self._settled = False
+        self._resize(min(self._ceiling, self.size * 2))
+
+    def _shrink(self):
+        """
+        Halve the size and cap it there. Should be called with self._lock held.
+        """
+        if not self._settled:
+            # A probe or a climb too far, wait longer before the next one.
+            self._recovery_steps *= 2
+        self._ceiling = max(1, self.size // 2)
+        if self._best_size > self._ceiling:
+            self._best_size = self._ceiling
+            self._best_throughput = 0.0
+        self._settled = True
+        self._clean_steps = 0
+        self._resize(self._ceiling)
+        logger().info(
+            f"Adaptive {self.name} batch size shrank to {self.size}, too many "
+            f"batches were too large."
+        )
+
+    def _resize(self, size):
+        """
+        Should be called with self._lock held.
+        """
+        if size != self.size:
+            logger().debug(f"Adaptive {self.name} batch size: {self.size} -> {size}")
+        self.size = size
@@ -1,22 +1,88 @@
 """
 Collector is a transitional container for the data flow between the processes.
-It takes in vertices and edges generated by the frontend, and then pass them 
+It takes in vertices and edges generated by the frontend, and then pass them
 to the backend.
 """
 
-from queue import Queue
+import threading
+from collections import deque
+from typing import List
 from core.graph.graph import GraphEdge, GraphVertex
 
 
+class BatchQueue:
+    """
+    A thread-safe FIFO queue like queue.Queue, except that lists of items
+    can be moved in one lock round-trip, and that it is sealed by closing
+    it rather than by putting a sentinel value.
+    If maxsize is positive, producers block while the queue is full.
+    """
+
+    def __init__(self, maxsize=0) -> None:
+        self.maxsize = maxsize
+        self._items = deque()
+        self._closed = False
+        self._mutex = threading.Lock()
+        self._not_empty = threading.Condition(self._mutex)
+        self._not_full = threading.Condition(self._mutex)
+
+    def qsize(self):
+        with self._mutex:
+            return len(self._items)
+
+    def put(self, item):
+        self.put_many((item,))
+
+    def put_many(self, items, block=True):
+        """
+        Block until the queue is not full, then append all items at once.
+        A list larger than the room left may overshoot maxsize, otherwise
+        it could wait forever. If block is false, append them even if the
+        queue is full.
+        """
+        with self._not_full:
+            while block and 0 < self.maxsize <= len(self._items) and not self._closed:
+                self._not_full.wait()
+            count = len(self._items)
+            self._items.extend(items)
+            self._not_empty.notify(len(self._items) - count)
+
+    def get(self):
+        """
+        Return the next item, or None if the queue is closed and drained.
+        """
+        items = self.get_batch(1)
+        return items[0] if items else None
+
+    def get_batch(self, n) -> list:
+        """
+        Block until there is any item, then return up to n of them.
+        Return an empty list if the queue is closed and drained.
+        """
+        with self._not_empty:
+            while not self._items and not self._closed:
+                self._not_empty.wait()
+            count = min(n, len(self._items))
+            items = [self._items.popleft() for _ in range(count)]
+            self._not_full.notify(count)
+            return items
+
+    def close(self):
+        with self._mutex:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+
 class Collector:
     """
     As a transitional container. It is thread-safe.
     """
 
     class Bucket:
-        def __init__(self, vertex_bucket: Queue, edge_bucket: Queue):
-            self.vertex_bucket: Queue = vertex_bucket
-            self.edge_bucket: Queue = edge_bucket
+        def __init__(self, vertex_bucket: BatchQueue, edge_bucket: BatchQueue):
+            self.vertex_bucket: BatchQueue = vertex_bucket
+            self.edge_bucket: BatchQueue = edge_bucket
 
         def vertex_count(self):
             """
@@ -32,15 +98,15 @@ class Collector:
 
         def seal_vertex(self):
             """
-            Seal the vertex bucket by adding a sentinel value.
+            Seal the vertex bucket, all getters get None once it is drained.
             """
-            self.vertex_bucket.put(None)
+            self.vertex_bucket.close()
 
         def seal_edge(self):
             """
-            Seal the edge bucket by adding a sentinel value.
+            Seal the edge bucket, all getters get None once it is drained.
             """
-            self.edge_bucket.put(None)
+            self.edge_bucket.close()
 
         def seal(self):
             self.seal_vertex()
@@ -51,7 +117,7 @@ class Collector:
         As a source to get vertices and edges from.
         """
 
-        def __init__(self, vertex_bucket: Queue, edge_bucket: Queue) -> None:
+        def __init__(self, vertex_bucket: BatchQueue, edge_bucket: BatchQueue) -> None:
             super().__init__(vertex_bucket, edge_bucket)
 
         def get_vertex(self) -> GraphVertex:
@@ -60,12 +126,24 @@ class Collector:
         def get_edge(self) -> GraphEdge:
             return self.edge_bucket.get()
 
+        def get_vertex_batch(self, n) -> List[GraphVertex]:
+            """
+            Get up to n vertices, an empty list means the bucket is sealed.
+            """
+            return self.vertex_bucket.get_batch(n)
+
+        def get_edge_batch(self, n) -> List[GraphEdge]:
+            """
+            Get up to n edges, an empty list means the bucket is sealed.
+            """
+            return self.edge_bucket.get_batch(n)
+
     class Sink(Bucket):
         """
         As a sink to put vertices and edges into.
         """
 
-        def __init__(self, vertex_bucket: Queue, edge_bucket: Queue) -> None:
+        def __init__(self, vertex_bucket: BatchQueue, edge_bucket: BatchQueue) -> None:
             super().__init__(vertex_bucket, edge_bucket)
 
         def put_vertex(self, vertex: GraphVertex):
@@ -74,9 +152,18 @@ class Collector:
         def put_edge(self, edge: GraphEdge):
             self.edge_bucket.put(edge)
 
-    def __init__(self) -> None:
-        self._vertex_bucket = Queue()
-        self._edge_bucket = Queue()
+        def put_vertices(self, vertices: List[GraphVertex]):
+            self.vertex_bucket.put_many(vertices)
+
+        def put_edges(self, edges: List[GraphEdge], block=True):
+            self.edge_bucket.put_many(edges, block)
+
+    def __init__(self, vertex_capacity=0, edge_capacity=0) -> None:
+        """
+        If capacity is positive, producers block while the bucket is full.
+        """
+        self._vertex_bucket = BatchQueue(vertex_capacity)
+        self._edge_bucket = BatchQueue(edge_capacity)
         self._source = Collector.Source(self._vertex_bucket, self._edge_bucket)
         self._sink = Collector.Sink(self._vertex_bucket, self._edge_bucket)
 
@@ -4,15 +4,92 @@ The process of frontend is described as follows:
 1. A SINGLE producer that emits all files.
 2. Multiple consumers to process the files.
 3. All consumers then output the results to the sink.
+
+Consumers run either in threads of the current process, or in a pool of
+worker processes. As consumers are pure Python CPU work, only the latter
+scales beyond one core. In process mode, each file is processed into a
+FrontEndResult, which is shipped back and replayed into the sink here.
+
+If a result cache is given, results of unchanged files are replayed from it
+instead of invoking the consumer at all.
 """
 
 import queue
 import threading
+from typing import List
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
 from lib.shared.logger import logger
+from core.graph.graph import GraphEdge, GraphVertex
 from core.process.collector import Collector
+from core.process.frontend.impl.cfg_lib.span_db import (
+    SpanDb,
+    local_span_db,
+    merge_span_db,
+)
+from core.process.frontend.impl.cg_lib.cg_db import CgDb, local_cg_db, merge_cg_db
+from core.process.frontend.result_cache import FrontEndResultCache
 from core.process.process import ProcessDescriptor
 from lib.shared.task_util import Task
 
+# Each pool worker may have this many files queued ahead of it.
+_FILES_IN_FLIGHT_PER_WORKER = 2
+
+
+class FrontEndResult:
+    """
+    Everything a consumer emitted for a single file. It acts as the sink
+    of the consumer, and also records its contributions to the CG tables
+    and statement spans.
+    """
+
+    def __init__(self, file: str) -> None:
+        self.file = file
+        self.vertices = []
+        self.edges = []
+        self.cg: CgDb = None
+        self.spans: SpanDb = None
+
+    def put_vertex(self, vertex: GraphVertex):
+        self.vertices.append(vertex)
+
+    def put_edge(self, edge: GraphEdge):
+        self.edges.append(edge)
+
+    def put_vertices(self, vertices: List[GraphVertex]):
+        self.vertices.extend(vertices)
+
+    def put_edges(self, edges: List[GraphEdge]):
+        self.edges.extend(edges)
+
+    def replay(self, sink: Collector.Sink):
+        """
+        Merge the CG tables and spans first, as the backend may read them
+        as soon as the edges arrive.
+        """
+        if self.cg is not None:
+            merge_cg_db(self.cg)
+        if self.spans is not None:
+            merge_span_db(self.spans)
+        sink.put_vertices(self.vertices)
+        sink.put_edges(self.edges)
+
+
+def invoke_isolated(consumer: Task, root: str, file: str) -> FrontEndResult:
+    """
+    Invoke the consumer on one file without touching any shared state.
+    """
+    result = FrontEndResult(file)
+    with local_cg_db() as cg, local_span_db() as spans:
+        consumer.invoke(root=root, file=file, sink=result)
+    result.cg = cg
+    result.spans = spans
+    return result
+
+
+def _init_pool_worker(log_level):
+    logger().setLevel(log_level)
+
 
 class FrontEndDescriptor(ProcessDescriptor):
     def __init__(
@@ -22,21 +99,31 @@ class FrontEndDescriptor(ProcessDescriptor):
         consumer: Task,
         sink: Collector.Sink,
         max_workers=0,
+        executor="thread",
+        result_cache: FrontEndResultCache = None,
     ) -> None:
         """
         :param root: the root folder to start with
         :param producer: if invoked, should emit all files as an enumeration
         :param consumer: if invoked with extra parameter (root, file, sink), should
             process the file, and output the results to the sink
+        :param executor: "thread" or "process", where the consumers run
+        :param result_cache: if given, results are replayed from and stored into it
         """
         super().__init__(max_workers)
+        if executor not in ("thread", "process"):
+            raise Exception(f"Executor {executor} is not supported.")
         self.root: str = root
         self.producer: Task = producer
         self.consumer: Task = consumer
         self.sink: Collector.Sink = sink
+        self.executor = executor
+        self.result_cache: FrontEndResultCache = result_cache
         self.files = queue.Queue()
 
     def get_process(self) -> Task:
+        if self.executor == "process":
+            return Task(self._process_in_pool)
         return Task(self._process)
 
     def _process(self):
@@ -53,6 +140,66 @@ class FrontEndDescriptor(ProcessDescriptor):
         for worker in workers:
             worker.join()
 
+    def _process_in_pool(self):
+        """
+        The current thread acts as the producer, and is the only one that
+        writes to the sink. Worker processes are spawned rather than forked,
+        as other threads of this process may hold locks at fork time.
+        """
+        logger().debug(f"Frontend pool with {self.max_workers} workers started.")
+        pending = {}
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_pool_worker,
+            initargs=(logger().level,),
+        ) as pool:
+            for file in self.producer.invoke():
+                replayed, key = self._replay_cached(file)
+                if replayed:
+                    continue
+                future = pool.submit(invoke_isolated, self.consumer, self.root, file)
+                pending[future] = (file, key)
+                if len(pending) >= self.max_workers * _FILES_IN_FLIGHT_PER_WORKER:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    self._collect(done, pending)
+            self._collect(list(pending), pending)
+        logger().debug("Frontend pool stopped.")
+
+    def _collect(self, futures, pending: dict):
+        for future in futures:
+            file, key = pending.pop(future)
+            try:
+                result: FrontEndResult = future.result()
+            except Exception:
+                logger().exception(f"Frontend failed to process: {file}")
+                continue
+            self._store_cached(key, result)
+            result.replay(self.sink)
+
+    def _consumer_name(self):
+        target = self.consumer.target
+        return f"{target.__module__}.{target.__qualname__}"
+
+    def _replay_cached(self, file):
+        """
+        Replay the cached result of the file if there is one. Return whether
+        it is replayed, and the key to store a fresh result with otherwise.
+        """
+        if self.result_cache is None:
+            return False, None
+        key = self.result_cache.key_of(self._consumer_name(), self.root, file)
+        result: FrontEndResult = self.result_cache.load(key)
+        if result is None:
+            return False, key
+        logger().debug(f"Replaying cached frontend result for: {file}")
+        result.replay(self.sink)
+        return True, key
+
+    def _store_cached(self, key, result: FrontEndResult):
+        if key is not None:
+            self.result_cache.store(key, result)
+
     def _producer(self):
         logger().debug("Frontend producer started.")
         for file in self.producer.invoke():
@@ -67,5 +214,12 @@ class FrontEndDescriptor(ProcessDescriptor):
             if file is None:
                 self.files.put(None)
                 break
-            self.consumer.invoke(root=self.root, file=file, sink=self.sink)
+            if self.result_cache is None:
+                self.consumer.invoke(root=self.root, file=file, sink=self.sink)
+                continue
+            replayed, key = self._replay_cached(file)
+            if not replayed:
+                result = invoke_isolated(self.consumer, self.root, file)
+                self._store_cached(key, result)
+                result.replay(self.sink)
         logger().debug(f"Frontend worker {name} stopped.")
@@ -6,10 +6,11 @@ import ast
 import json
 from core.process.frontend.common import get_frontend_producer, count_python_files
 from core.process.frontend.impl.cfg_lib.cfg_utils import CfgBuildCtx
+from core.process.frontend.impl.cfg_lib.span_db import get_span_db, statement_span
 from core.process.frontend.impl.cg_lib.cg_db import get_cg_db
 from core.process.frontend.impl.cg_lib.cg_utils import (
     read_import_from,
-    search_callees,
+    collect_call_sites,
     update,
     search_function_through_path
 )
@@ -22,6 +23,7 @@ from lib.shared.path_util import (
     split_path
 )
 from core.process.frontend.frontend import FrontEndDescriptor
+from core.process.frontend.result_cache import FrontEndResultCache
 from core.process.collector import Collector
 from core.graph.graph import GraphEdge, GraphVertex
 from scalpel.cfg import CFGBuilder
@@ -65,6 +67,7 @@ def _add_vertices(
         node: SrcNode = to_src_without_children(statement)
         json_ast = json.dumps(ast2json(statement))
         v = None
+        ctx.spans.add(ctx.file, *statement_span(statement))
 
         if isinstance(statement, ast.FunctionDef):
             v = GraphVertex(
@@ -144,9 +147,8 @@ def _add_vertices(
             here, we choose a double-deck dic as value, keys are function names
             and each function name has a list of the files and linos(id) it appears
             """
-            # match JSON and put Call
-            stmt_ast = json.dumps(ast.dump(to_src_without_children(statement).node))
-            callees = search_callees(stmt_ast)
+            # no need to build repeated edges
+            callees = dict.fromkeys(name for name, _, _ in collect_call_sites(node.node))
             for callee in callees:
 
                 # TODO: search, add the real name and path
@@ -222,10 +224,17 @@ def _build_cfg_for_single_file(root: str, file: str, sink: Collector.Sink):
     flattened_cfg = CFGBuilder().build_from_file(
         get_file_name(file), file, flattened=True
     )
-    file = get_relative_path(file, root)
+    build_cfg_from_flattened(get_relative_path(file, root), flattened_cfg, sink)
+
+
+def build_cfg_from_flattened(file: str, flattened_cfg, sink: Collector.Sink):
+    """
+    Emit CFG vertices and edges of an already built flattened CFG.
+    :param file: path of the file relative to the project root
+    """
     # first we put a file vertex
     sink.put_vertex(GraphVertex("file", {"file": file}))
-    ctx = CfgBuildCtx(file, sink)
+    ctx = CfgBuildCtx(file, sink, get_span_db())
 
     # TODO: create new cache value
     cache = get_cg_db()
@@ -240,7 +249,12 @@ def _build_cfg_for_single_file(root: str, file: str, sink: Collector.Sink):
 
 
 def get_cfg_frontend_descriptor(
-    root: str, producer: Task, sink: Collector.Sink, max_workers=None
+    root: str,
+    producer: Task,
+    sink: Collector.Sink,
+    max_workers=None,
+    executor="thread",
+    result_cache: FrontEndResultCache = None,
 ) -> FrontEndDescriptor:
     """
     Get the descriptor for CFG frontend process.
@@ -253,4 +267,6 @@ def get_cfg_frontend_descriptor(
         consumer=Task(_build_cfg_for_single_file),
         sink=sink,
         max_workers=max_workers,
+        executor=executor,
+        result_cache=result_cache,
     )
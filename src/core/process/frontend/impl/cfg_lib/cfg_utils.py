@@ -1,10 +1,12 @@
 from core.process.collector import Collector
+from core.process.frontend.impl.cfg_lib.span_db import SpanDb
 
 
 class CfgBuildCtx:
-    def __init__(self, file: str, sink: Collector.Sink) -> None:
+    def __init__(self, file: str, sink: Collector.Sink, spans: SpanDb) -> None:
         self.file = file
         self.sink: Collector.Sink = sink
+        self.spans: SpanDb = spans
         self.visited_block_first = {}
         self.visited_block_last = {}
         self.function_def_dic = {}
@@ -0,0 +1,155 @@
+"""
+Lines covered by each statement vertex, recorded by the CFG frontend.
+
+A statement vertex is keyed by its first line, but a statement may span more
+lines, and other frontends may refer to any of them. The span of a simple
+statement is all its lines. The span of a compound statement is its header
+only, as the statements of its body are vertices of their own.
+"""
+
+import ast
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+from core.graph.graph import GraphVertex
+
+
+class SpanDb:
+    def __init__(self) -> None:
+        # file -> {first line: last line}
+        self.spans = {}
+
+    def add(self, file: str, start: int, end: int):
+        spans = self.spans.setdefault(file, {})
+        spans[start] = max(end, spans.get(start, start))
+
+
+SPAN_DB = SpanDb()
+
+# Guard merging into SPAN_DB, the per-task tables are merged from many threads.
+_SPAN_DB_LOCK = threading.Lock()
+
+# Thread-local redirection of get_span_db(), see local_span_db().
+_LOCAL = threading.local()
+
+# Set once the CFG frontend is done, after which SPAN_DB never changes.
+_SPAN_DB_SEALED = threading.Event()
+
+# Built from SPAN_DB when it is sealed, and shared by all backend clients.
+_SPAN_INDEX = None
+
+
+def get_span_db() -> SpanDb:
+    db = getattr(_LOCAL, "db", None)
+    return SPAN_DB if db is None else db
+
+
+@contextmanager
+def local_span_db():
+    """
+    Redirect get_span_db() of the current thread to a fresh SpanDb, the same
+    way as local_cg_db.
+    """
+    db = SpanDb()
+    _LOCAL.db = db
+    try:
+        yield db
+    finally:
+        _LOCAL.db = None
+
+
+def merge_span_db(db: SpanDb):
+    with _SPAN_DB_LOCK:
+        for file, spans in db.spans.items():
+            for start, end in spans.items():
+                SPAN_DB.add(file, start, end)
+
+
+def statement_span(statement: ast.stmt):
+    """
+    Return the first and last line of the statement, excluding the body
+    and decorators of compound statements.
+    """
+    if not hasattr(statement, "body"):
+        return statement.lineno, statement.end_lineno
+    end = statement.lineno
+    for field, value in ast.iter_fields(statement):
+        if field == "decorator_list":
+            continue
+        for child in value if isinstance(value, list) else [value]:
+            if not isinstance(child, ast.AST) or isinstance(
+                child, (ast.stmt, ast.excepthandler)
+            ):
+                continue
+            for node in ast.walk(child):
+                end = max(end, getattr(node, "end_lineno", None) or end)
+    return statement.lineno, end
+
+
+class SpanIndex:
+    """
+    Read-only index of the spans, to find the statement a line belongs to
+    by bisection. Answers are memoized, including lines of no statement.
+    """
+
+    def __init__(self, db: SpanDb) -> None:
+        self._starts = {}
+        self._ends = {}
+        for file, spans in db.spans.items():
+            starts = sorted(spans)
+            self._starts[file] = starts
+            self._ends[file] = [spans[start] for start in starts]
+        self._owners = {}
+
+    def owner_of(self, file: str, lineno: int) -> int:
+        """
+        Return the first line of the statement covering the line, or None.
+        """
+        owner = self._owners.get((file, lineno), 0)
+        if owner != 0:
+            return owner
+        owner = None
+        starts = self._starts.get(file, None)
+        if starts is not None:
+            i = bisect_right(starts, lineno) - 1
+            if i >= 0 and lineno <= self._ends[file][i]:
+                owner = starts[i]
+        self._owners[(file, lineno)] = owner
+        return owner
+
+    def owner_key(self, vertex: GraphVertex) -> str:
+        """
+        Return the key of the statement vertex the vertex refers to, or None
+        if it refers to a line of no statement. Vertices that are not lines
+        of code, like files and function ends, refer to themselves.
+        """
+        if vertex.label != "code" or vertex.lineno <= 0:
+            return vertex.key
+        file = vertex.props["file"]
+        owner = self.owner_of(file, vertex.lineno)
+        return None if owner is None else f"{file}:{owner}"
+
+
+def seal_span_db():
+    """
+    Mark the spans as complete, and build the index shared by all backend
+    clients. Should be called after the CFG frontend is done.
+    """
+    global _SPAN_INDEX
+    _SPAN_INDEX = SpanIndex(SPAN_DB)
+    _SPAN_DB_SEALED.set()
+
+
+def is_span_db_sealed() -> bool:
+    return _SPAN_DB_SEALED.is_set()
+
+
+def get_span_index() -> SpanIndex:
+    """
+    Return the shared index. Raise if the spans are not sealed yet, as an
+    index of incomplete spans would memoize wrong answers. Edges that need
+    the index should be held back until is_span_db_sealed().
+    """
+    if not _SPAN_DB_SEALED.is_set():
+        raise Exception("Spans are not sealed yet.")
+    return _SPAN_INDEX
@@ -3,7 +3,7 @@ Core functions to generate control flow graph from Python code.
 """
 
 from core.process.frontend.frontend import FrontEndDescriptor
-from core.process.frontend.impl.cg_lib.cg_db import get_cg_db
+from core.process.frontend.impl.cg_lib.cg_db import get_cg_db, seal_cg_db
 from core.process.frontend.impl.cg_lib.cg_db import get_cg_db
 from core.process.frontend.impl.cg_lib.cg_utils import not_appeared_and_add
 from lib.shared.logger import logger
@@ -86,30 +86,61 @@ def _add_edge(ctx: CgBuildCtx, caller_id: str, callee_id: str, related_edge: dic
         ctx.sink.put_edge(GraphEdge("dfg", callee, call_back))
 
 
-def __read_and_add(ctx: CgBuildCtx, cache_ed: dict, cache_er: dict):
-    logger().info(f"len of cache_caller:{len(cache_er)}")
-    related_edge = dict()
-    for spt_path, sub_ed in cache_ed.items():
-        logger().info(f"spt_path:{spt_path}")
-        if isinstance(sub_ed, set):
-            if spt_path in cache_er:
-                linos = cache_er[spt_path]
-                caller_id = next(iter(linos))
-                for callee_id in sub_ed:
-                    _add_edge(ctx, caller_id, callee_id, related_edge)
+class SymbolIndex:
+    """
+    Flat symbol table over the nested caller (function definition) tables,
+    so that each call site is resolved with dict lookups only.
+    A path is the tuple of keys leading to the table a name is defined in.
+    """
+
+    def __init__(self, callers: dict) -> None:
+        # (path, name) -> keys of the definitions
+        self.by_path = {}
+        # (parent of path, name) -> keys of the definitions, for each path
+        self.by_package = {}
+        self._index(callers, ())
+
+    def _index(self, tree: dict, path: tuple):
+        for name, sub in tree.items():
+            if isinstance(sub, set):
+                self.by_path[(path, name)] = sub
+                if len(path) > 0:
+                    self.by_package.setdefault((path[:-1], name), []).append(sub)
             else:
-                for file_name, func_names in cache_er.items():
-                    for callee_id in sub_ed:
-                        if spt_path in func_names:
-                            linos = func_names[spt_path]
-                            caller_id = next(iter(linos))
-                            _add_edge(ctx, caller_id, callee_id, related_edge)
+                self._index(sub, path + (name,))
+
+    def resolve(self, path: tuple, name: str) -> list:
+        """
+        Return keys of the definitions a call to name under path refers to.
+        If name is not defined right under path, as when path is a package,
+        the definitions in its direct children are taken.
+        """
+        definitions = self.by_path.get((path, name), None)
+        if definitions is not None:
+            return [definitions]
+        return self.by_package.get((path, name), [])
 
+
+def _walk_call_sites(tree: dict, path: tuple):
+    """
+    Yield (path, name, call sites) of all calls in the nested callee tables.
+    """
+    for name, sub in tree.items():
+        if isinstance(sub, set):
+            yield path, name, sub
         else:
-            if spt_path in cache_er:
-                logger().info(f"caller contains {spt_path}")
-                sub_er = cache_er[spt_path]
-                __read_and_add(ctx, sub_ed, sub_er)
+            yield from _walk_call_sites(sub, path + (name,))
+
+
+def __read_and_add(ctx: CgBuildCtx, cache_ed: dict, cache_er: dict):
+    index = SymbolIndex(cache_er)
+    logger().info(f"Indexed {len(index.by_path)} function definitions.")
+    related_edge = dict()
+    for path, name, call_sites in _walk_call_sites(cache_ed, ()):
+        for definitions in index.resolve(path, name):
+            caller_id = next(iter(definitions))
+            for callee_id in call_sites:
+                _add_edge(ctx, caller_id, callee_id, related_edge)
 
 
 def _find_link(sink: Collector.Sink):
@@ -141,6 +172,7 @@ def _find_link(sink: Collector.Sink):
 def _build_cg(sink: Collector.Sink):
     logger().info(f"Building CG...")
     _find_link(sink)
+    seal_cg_db()
     logger().info("CG ready to go!")
 
 
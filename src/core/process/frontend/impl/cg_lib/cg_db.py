@@ -1,3 +1,6 @@
+import threading
+from contextlib import contextmanager
+from types import MappingProxyType
 from typing import OrderedDict
 
 
@@ -9,32 +12,111 @@ class CgDb:
 
 CG_DB = CgDb()
 
+# Guard merging into CG_DB, the per-task tables are merged from many threads.
+_CG_DB_LOCK = threading.Lock()
+
+# Thread-local redirection of get_cg_db(), see local_cg_db().
+_LOCAL = threading.local()
+
+# Set once CG linking is done, after which CG_DB never changes.
+_CG_DB_SEALED = threading.Event()
+
+# Built from CG_DB when it is sealed, and shared by all backend clients.
+_CG_INDEX = None
+
 
 def get_cg_db() -> CgDb:
-    return CG_DB
-
-
-def get_cg_db_transformed() -> CgDb:
-    # print(f"CG_DB.caller: {CG_DB.caller}")
-    # print(f"CG_DB.callee: {CG_DB.callee}")
-    transformed = {
-        "caller": dict(),
-        "callee": dict(),
-    }
-    for file in CG_DB.caller:
-        for func in CG_DB.caller[file]:
-            for line in list(CG_DB.caller[file][func]):
-                if line in transformed["caller"]:
-                    transformed["caller"][line].append(func)
-                else:
-                    transformed["caller"][line] = [func]
-
-    for file in CG_DB.callee:
-        for func in CG_DB.callee[file]:
-            for line in list(CG_DB.callee[file][func]):
-                if line in transformed["callee"]:
-                    transformed["callee"][line].append(func)
-                else:
-                    transformed["callee"][line] = [func]
-
-    return transformed
+    db = getattr(_LOCAL, "db", None)
+    return CG_DB if db is None else db
+
+
+@contextmanager
+def local_cg_db():
+    """
+    Redirect get_cg_db() of the current thread to a fresh CgDb, so that the
+    contributions of a single task can be collected, shipped to another
+    process if needed, and merged later with merge_cg_db.
+    """
+    db = CgDb()
+    _LOCAL.db = db
+    try:
+        yield db
+    finally:
+        _LOCAL.db = None
+
+
+def _merge_tree(dst: dict, src: dict):
+    for k, v in src.items():
+        if isinstance(v, set):
+            dst.setdefault(k, set()).update(v)
+        else:
+            _merge_tree(dst.setdefault(k, dict()), v)
+
+
+def merge_cg_db(db: CgDb):
+    """
+    Merge caller and callee tables of the given CgDb into the global one.
+    """
+    with _CG_DB_LOCK:
+        _merge_tree(CG_DB.caller, db.caller)
+        _merge_tree(CG_DB.callee, db.callee)
+
+
+class CgIndex:
+    """
+    Read-only index of the CG tables by line: the names of functions called
+    at each line, and the names of functions defined at each line.
+    """
+
+    def __init__(self, db: CgDb) -> None:
+        self.calls = _index_by_line(db.callee)
+        self.defines = _index_by_line(db.caller)
+
+    def is_call_to_definition(self, from_key: str, to_key: str) -> bool:
+        """
+        Whether from_key calls a function with the name defined at to_key.
+        It allocates nothing, as it runs for every dfg edge.
+        """
+        calls = self.calls.get(from_key, None)
+        if calls is None:
+            return False
+        defines = self.defines.get(to_key, None)
+        return defines is not None and not calls.isdisjoint(defines)
+
+
+def _index_by_line(tree: dict) -> MappingProxyType:
+    index = dict()
+    stack = [tree]
+    while len(stack) > 0:
+        for name, sub in stack.pop().items():
+            if isinstance(sub, set):
+                for line in sub:
+                    index.setdefault(line, set()).add(name)
+            else:
+                stack.append(sub)
+    return MappingProxyType({line: frozenset(names) for line, names in index.items()})
+
+
+def seal_cg_db():
+    """
+    Mark the CG tables as complete, and build the index shared by all
+    backend clients. Should be called after CG linking.
+    """
+    global _CG_INDEX
+    _CG_INDEX = CgIndex(CG_DB)
+    _CG_DB_SEALED.set()
+
+
+def is_cg_db_sealed() -> bool:
+    return _CG_DB_SEALED.is_set()
+
+
+def get_cg_index() -> CgIndex:
+    """
+    Return the shared index. Raise if the CG tables are not sealed yet, as
+    they may still change. Edges that need the index should be held back
+    until is_cg_db_sealed().
+    """
+    if not _CG_DB_SEALED.is_set():
+        raise Exception("CG tables are not sealed yet.")
+    return _CG_INDEX
@@ -7,32 +7,53 @@ from lib.shared.path_util import (
     split_path
 )
 from core.cache.connection import get_cache_proxy
-import re
 import builtins
-from typing import Tuple
+from typing import List, Tuple
 import os
 
+_BUILTINS = frozenset(dir(builtins))
 
-# no need too build repeated edges
-def search_callees(stmt_ast: str) -> set:
-    callees = set()
-    pattern = r"Call\(func=Name\(id='([^']+)',"
-    matches = re.findall(pattern, stmt_ast)
-    for match in matches:
-        callee_function = match
-        if callee_function not in dir(builtins):
-            # TODO: add full path later
-            callees.add(f"{callee_function}")
-
-    pattern = r"Call\(func=Attribute\(value=Name\(id='[^']+'\s*,\s*ctx=.*\)\s*,\s*attr='([^']+)'"
-    matches = re.findall(pattern, stmt_ast)
-    for match in matches:
-        callee_function = match
-        if callee_function not in dir(builtins):
-            # TODO: add full path later
-            callees.add(f"{callee_function}")
-
-    return callees
+
+class _CallSiteVisitor(ast.NodeVisitor):
+    def __init__(self) -> None:
+        self.call_sites = []
+
+    def visit_Call(self, node: ast.Call):
+        name, chain = _resolve_callee(node.func)
+        if name is not None and name not in _BUILTINS:
+            self.call_sites.append((name, chain, node.lineno))
+        # arguments and the callee itself may contain calls as well
+        self.generic_visit(node)
+
+
+def _resolve_callee(func: ast.expr) -> Tuple[str, tuple]:
+    """
+    Return the called name, and the names it is an attribute of. For
+    a.b.c(), it is ("c", ("a", "b")). The chain stops at anything other
+    than a name, so for f().c() it is ("c", ()).
+    """
+    if isinstance(func, ast.Name):
+        return func.id, ()
+    if isinstance(func, ast.Attribute):
+        chain = []
+        value = func.value
+        while isinstance(value, ast.Attribute):
+            chain.append(value.attr)
+            value = value.value
+        if isinstance(value, ast.Name):
+            chain.append(value.id)
+        return func.attr, tuple(reversed(chain))
+    return None, ()
+
+
+def collect_call_sites(node: ast.AST) -> List[Tuple[str, tuple, int]]:
+    """
+    Collect all calls in the node, including nested and chained ones, as
+    (name, attribute chain, lineno). Calls to builtin names are skipped.
+    """
+    visitor = _CallSiteVisitor()
+    visitor.visit(node)
+    return visitor.call_sites
 
 
 def update_cache(deck: int, *args: str):
@@ -26,6 +26,7 @@ from lib.shared.path_util import (
     get_relative_path,
 )
 from core.process.frontend.frontend import FrontEndDescriptor
+from core.process.frontend.result_cache import FrontEndResultCache
 from core.process.collector import Collector
 from core.graph.graph import GraphEdge, GraphVertex
 from scalpel.cfg import CFGBuilder
@@ -40,7 +41,14 @@ def _build_dfg_for_single_file(root: str, file: str, sink: Collector.Sink):
     flattened_cfg = CFGBuilder().build_from_file(
         get_file_name(file), file, flattened=True
     )
+    build_dfg_from_flattened(get_relative_path(file, root), flattened_cfg, sink)
 
+
+def build_dfg_from_flattened(file: str, flattened_cfg, sink: Collector.Sink):
+    """
+    Emit DFG edges of an already built flattened CFG.
+    :param file: path of the file relative to the project root
+    """
     # Generate SSA
     ssa_results, const_dict = build_ssa(flattened_cfg)
 
@@ -65,7 +73,6 @@ def _build_dfg_for_single_file(root: str, file: str, sink: Collector.Sink):
     paths = extract_paths(dependencies)
 
     # Add edges.
-    file = get_relative_path(file, root)
     for path in paths:
         if path[0] == path[1]:
             continue
@@ -75,7 +82,12 @@ def _build_dfg_for_single_file(root: str, file: str, sink: Collector.Sink):
 
 
 def get_dfg_frontend_descriptor(
-    root: str, producer: Task, sink: Collector.Sink, max_workers=None
+    root: str,
+    producer: Task,
+    sink: Collector.Sink,
+    max_workers=None,
+    executor="thread",
+    result_cache: FrontEndResultCache = None,
 ) -> FrontEndDescriptor:
     """
     Get the descriptor for DFG frontend process.
@@ -88,4 +100,6 @@ def get_dfg_frontend_descriptor(
         consumer=Task(_build_dfg_for_single_file),
         sink=sink,
         max_workers=max_workers,
+        executor=executor,
+        result_cache=result_cache,
     )
@@ -68,11 +68,9 @@ def build_dependencies(
 def extract_paths(dependencies):
     """
     Extract simple paths from dependencies, which means,
-    only keep lineno information.
+    only keep lineno information. The order of first appearance is kept.
     """
-    paths = []
+    paths = dict()
     for dep in dependencies:
-        path = (dep["src"]["lineno"], dep["dst"]["lineno"])
-        if path not in paths:
-            paths.append(path)
-    return paths
+        paths[(dep["src"]["lineno"], dep["dst"]["lineno"])] = None
+    return list(paths)
@@ -42,30 +42,26 @@ class DependencyEntry:
 
 class DependencyCollection:
     """
-    Index database for DependencyEntry.
+    Index database for DependencyEntry, indexed by line_no.
     """
 
     def __init__(self):
-        self.context = []
+        self.context = {}
 
     def add(self, entry: DependencyEntry):
-        if self.find(entry.line_no) is None:
-            self.context.append(entry)
-        else:
+        if entry.line_no in self.context:
             raise Exception("Duplicate dependency entry")
+        self.context[entry.line_no] = entry
 
     def find(self, line_no):
-        for entry in self.context:
-            if entry.line_no == line_no:
-                return entry
-        return None
+        return self.context.get(line_no, None)
 
     def values(self):
-        for entry in self.context:
+        for entry in self.context.values():
             yield entry
 
     def dumps(self):
-        return dict_dumps([entry.to_dict() for entry in self.context])
+        return dict_dumps([entry.to_dict() for entry in self.context.values()])
 
 
 ############################################################
@@ -96,42 +92,57 @@ class ConstantEntry:
 
 
 class ConstantCollection:
+    """
+    Index database for ConstantEntry, indexed by (ident, id).
+    """
+
     def __init__(self):
-        self.context = []
+        self.context = {}
+        # ident -> idents to look up along the scope chain
+        self._scopes = {}
+        # (ident, id) -> result of find, cleared on every add
+        self._found = {}
 
     def add(self, entry: ConstantEntry):
-        if self.shallow_find(entry.ident, entry.id) is None:
-            self.context.append(entry)
-        else:
+        if (entry.ident, entry.id) in self.context:
             raise Exception("Duplicate constant entry")
+        self.context[(entry.ident, entry.id)] = entry
+        self._found.clear()
 
     def shallow_find(self, ident, id) -> ConstantEntry:
-        for entry in self.context:
-            if entry.ident == ident and entry.id == id:
-                return entry
-        return None
+        return self._find(ident, id)
 
     def find(self, ident, id) -> ConstantEntry:
-        entry = self._find(ident, id)
-        if entry is not None:
-            return entry
-
-        module_name, name = split_module_name(ident)
-        while module_name != "":
-            entry = self._find(module_name + "." + name, id)
+        """
+        Find the constant in the scope of ident, then in its parent scopes.
+        """
+        if (ident, id) in self._found:
+            return self._found[(ident, id)]
+        entry = None
+        for scoped_ident in self._scope_chain(ident):
+            entry = self._find(scoped_ident, id)
             if entry is not None:
-                return entry
+                break
+        self._found[(ident, id)] = entry
+        return entry
+
+    def _scope_chain(self, ident):
+        chain = self._scopes.get(ident, None)
+        if chain is None:
+            chain = [ident]
+            module_name, name = split_module_name(ident)
             module_name = get_parent_module_name(module_name)
-        return None
+            while module_name != "":
+                chain.append(module_name + "." + name)
+                module_name = get_parent_module_name(module_name)
+            self._scopes[ident] = chain
+        return chain
 
     def _find(self, ident, id) -> ConstantEntry:
-        for entry in self.context:
-            if entry.ident == ident and entry.id == id:
-                return entry
-        return None
+        return self.context.get((ident, id), None)
 
     def dumps(self):
-        return dict_dumps([entry.to_dict() for entry in self.context])
+        return dict_dumps([entry.to_dict() for entry in self.context.values()])
 
 
 ############################################################
@@ -0,0 +1,56 @@
+"""
+Core function to generate both CFG and DFG in a single pass.
+
+CFG and DFG frontends both start from the same flattened scalpel CFG. Building
+it is the most expensive part of the frontend, so in fused mode each file is
+read, parsed and flattened only once, then fed to both generators.
+"""
+
+from core.process.frontend.common import count_python_files
+from core.process.frontend.impl.cfg import build_cfg_from_flattened
+from core.process.frontend.impl.dfg import build_dfg_from_flattened
+from lib.shared.task_util import Task, get_cpu_count
+from lib.shared.logger import logger
+from lib.shared.path_util import (
+    get_file_name,
+    get_relative_path,
+)
+from core.process.frontend.frontend import FrontEndDescriptor
+from core.process.frontend.result_cache import FrontEndResultCache
+from core.process.collector import Collector
+from scalpel.cfg import CFGBuilder
+
+
+def _build_fused_for_single_file(root: str, file: str, sink: Collector.Sink):
+    logger().info(f"Building CFG & DFG for: {file}")
+    flattened_cfg = CFGBuilder().build_from_file(
+        get_file_name(file), file, flattened=True
+    )
+    file = get_relative_path(file, root)
+    # CFG must go first, as it fills the CG tables that are read later.
+    build_cfg_from_flattened(file, flattened_cfg, sink)
+    build_dfg_from_flattened(file, flattened_cfg, sink)
+
+
+def get_fused_frontend_descriptor(
+    root: str,
+    producer: Task,
+    sink: Collector.Sink,
+    max_workers=None,
+    executor="thread",
+    result_cache: FrontEndResultCache = None,
+) -> FrontEndDescriptor:
+    """
+    Get the descriptor for fused CFG & DFG frontend process.
+    """
+    if max_workers is None or max_workers <= 0:
+        max_workers = max(1, min(get_cpu_count(), count_python_files(root) // 4))
+    return FrontEndDescriptor(
+        root=root,
+        producer=producer,
+        consumer=Task(_build_fused_for_single_file),
+        sink=sink,
+        max_workers=max_workers,
+        executor=executor,
+        result_cache=result_cache,
+    )
@@ -0,0 +1,83 @@
+"""
+Persistent, content-addressed cache of frontend results across runs.
+
+A FrontEndResult only depends on the content of the file, its path relative
+to the project root, the consumer that produced it and the version of the
+frontend. So it is stored under a hash of exactly these, and unchanged files
+can be replayed from disk without parsing them again.
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from lib.shared.logger import logger
+from lib.shared.path_util import get_relative_path
+
+# Bump this whenever the output of any frontend changes, so that entries
+# written by an older version are never replayed.
+FRONTEND_VERSION = "3"
+
+
+class FrontEndResultCache:
+    """
+    Results are pickled into one file per entry, fanned out into
+    sub-directories by the first two characters of the key. It is safe to
+    delete the whole directory at any time.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def key_of(self, consumer: str, root: str, file: str) -> str:
+        """
+        :param consumer: name of the consumer that produces the result
+        """
+        digest = hashlib.sha256()
+        for part in (
+            FRONTEND_VERSION,
+            f"{sys.version_info.major}.{sys.version_info.minor}",
+            consumer,
+            get_relative_path(file, root),
+        ):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        with open(file, "rb") as f:
+            digest.update(f.read())
+        return digest.hexdigest()
+
+    def load(self, key: str):
+        """
+        Return the cached result, or None on a miss.
+        """
+        path = self._path_of(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger().warning(f"Dropping broken frontend cache entry {path}: {e}")
+            os.remove(path)
+            return None
+
+    def store(self, key: str, result):
+        """
+        Write to a temporary file first, so that concurrent runs never
+        observe a partially written entry.
+        """
+        path = self._path_of(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except Exception:
+            os.remove(tmp)
+            raise
+
+    def _path_of(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".pkl")
@@ -41,12 +41,37 @@ def parse_args():
         default=0,
         help="Number of threads for calculating",
     )
+    parser.add_argument(
+        "--calc-mode",
+        type=str,
+        default="thread",
+        choices=["thread", "process"],
+        help="Run calculating workers in threads or in separate processes",
+    )
+    parser.add_argument(
+        "--frontend-cache",
+        type=str,
+        default=None,
+        help="Directory to cache frontend results of unchanged files across runs",
+    )
     parser.add_argument(
         "--io-thread",
         type=int,
         default=0,
         help="Number of threads for IO",
     )
+    parser.add_argument(
+        "--streaming",
+        default=False,
+        action="store_true",
+        help="Write edges while vertices are still arriving",
+    )
+    parser.add_argument(
+        "--capacity",
+        type=int,
+        default=0,
+        help="Max number of vertices or edges buffered for the backend",
+    )
     parser.add_argument(
         "--v-batch",
         type=int,
@@ -59,6 +84,18 @@ def parse_args():
         default=200,
         help="Number of edges in a batch",
     )
+    parser.add_argument(
+        "--adaptive-batch",
+        default=False,
+        action="store_true",
+        help="Adapt batch sizes to the database at runtime, starting from the given ones",
+    )
+    parser.add_argument(
+        "--async-window",
+        type=int,
+        default=0,
+        help="Write from an event loop with this many batches in flight per IO thread",
+    )
     parser.add_argument(
         "-f",
         "--force",
@@ -73,6 +110,12 @@ def parse_args():
         action="store_true",
         help="Only build the graph with this flag set",
     )
+    parser.add_argument(
+        "--fused",
+        default=False,
+        action="store_true",
+        help="Build CFG and DFG in a single pass over each file",
+    )
     parser.add_argument(
         "-l",
         "--log",
@@ -3,8 +3,12 @@ import os
 
 import yaml
 from core.cache.cache_proxy import CacheProxy
+from core.db.bulkcsv.connection import get_bulkcsv_client, resolve_bulkcsv
+from core.db.csr.connection import get_csr_client, resolve_csr
 from core.db.filedb.connection import get_filedb_client, resolve_filedb
 from core.db.gremlin.connection import get_gremlin_client, resolve_gremlin
+from core.db.memory.connection import get_memory_client, resolve_memory
+from core.db.sqlite.connection import get_sqlite_client, resolve_sqlite
 
 
 def get_backend_client(config: dict, cache: CacheProxy):
@@ -17,6 +21,18 @@ def get_backend_client(config: dict, cache: CacheProxy):
     if db == "filedb":
         resolve_filedb(config["FILEDB"])
         return get_filedb_client()
+    if db == "csr":
+        resolve_csr(config["CSR"])
+        return get_csr_client()
+    if db == "bulkcsv":
+        resolve_bulkcsv(config["BULKCSV"])
+        return get_bulkcsv_client()
+    if db == "sqlite":
+        resolve_sqlite(config["SQLITE"])
+        return get_sqlite_client()
+    if db == "memory":
+        resolve_memory(config.get("MEMORY", None))
+        return get_memory_client()
     raise Exception(f"Database {db} is not supported.")
 
 
@@ -2,7 +2,10 @@
 Main module for the Python2Graph project.
 
 usage: py2graph.py [-h] [-p PROJECT] [-c CONFIG] [--calc-thread CALC_THREAD]
-                   [--io-thread IO_THREAD] [--v-batch V_BATCH] [--e-batch E_BATCH] [-f] [-b]
+                   [--calc-mode {thread,process}] [--frontend-cache FRONTEND_CACHE]
+                   [--io-thread IO_THREAD] [--streaming] [--capacity CAPACITY]
+                   [--v-batch V_BATCH] [--e-batch E_BATCH] [--adaptive-batch]
+                   [--async-window ASYNC_WINDOW] [-f] [-b] [--fused]
                    [-l (DEBUG|INFO|WARNING|ERROR|CRITICAL)]
 
 Convert Python code to graph, and store in graph database.
@@ -15,12 +18,22 @@ optional arguments:
                         Path to the configuration file
   --calc-thread CALC_THREAD
                         Number of threads for calculating
+  --calc-mode {thread,process}
+                        Run calculating workers in threads or in separate processes
+  --frontend-cache FRONTEND_CACHE
+                        Directory to cache frontend results of unchanged files across runs
   --io-thread IO_THREAD
                         Number of threads for IO
+  --streaming           Write edges while vertices are still arriving
+  --capacity CAPACITY   Max number of vertices or edges buffered for the backend
   --v-batch V_BATCH     Number of vertices in a batch
   --e-batch E_BATCH     Number of edges in a batch
+  --adaptive-batch      Adapt batch sizes to the database at runtime, starting from the given ones
+  --async-window ASYNC_WINDOW
+                        Write from an event loop with this many batches in flight per IO thread
   -f, --force           If true, will clear previous database
   -b, --build           Only build the graph with this flag set
+  --fused               Build CFG and DFG in a single pass over each file
   -l (DEBUG|INFO|WARNING|ERROR|CRITICAL), --log (DEBUG|INFO|WARNING|ERROR|CRITICAL)
                         Log level, by default is INFO
 """
@@ -38,6 +51,9 @@ from core.process.frontend.impl.dfg import get_dfg_frontend_descriptor
 from lib.argument import parse_args
 from lib.shared.path_util import format_path
 from core.process.frontend.impl.cg import get_cg_frontend_descriptor
+from core.process.frontend.impl.cfg_lib.span_db import seal_span_db
+from core.process.frontend.impl.fused import get_fused_frontend_descriptor
+from core.process.frontend.result_cache import FrontEndResultCache
 
 if __name__ == "__main__":
     # Parse argument.
@@ -67,7 +83,13 @@ if __name__ == "__main__":
     client = get_backend_client(config["BACKEND"], cache)
 
     logger().info("Initializing pipe...")
-    pipe = Collector()
+    # Edges are only taken after all vertices unless streaming, so bounding
+    # them would block the frontend forever.
+    edge_capacity = args.capacity
+    if args.capacity > 0 and not args.streaming:
+        logger().warning("Capacity only applies to vertices without streaming.")
+        edge_capacity = 0
+    pipe = Collector(args.capacity, edge_capacity)
 
     ############################################################
     # Following are actual works.
@@ -94,27 +116,43 @@ if __name__ == "__main__":
             if affected_files != None:
                 input_file_task = get_specified_files_task(root, affected_files)
 
+        result_cache = None
+        if args.frontend_cache is not None:
+            cache_dir = format_path(args.frontend_cache)
+            logger().info(f"Using frontend result cache at: {cache_dir}")
+            result_cache = FrontEndResultCache(cache_dir)
+
+        # In fused mode, CFG and DFG share one pass, so there is no DFG thread.
+        get_frontend_descriptor = (
+            get_fused_frontend_descriptor if args.fused else get_cfg_frontend_descriptor
+        )
         cfg_thread = (
-            get_cfg_frontend_descriptor(
+            get_frontend_descriptor(
                 root,
                 input_file_task,
                 pipe.as_sink(),
                 get_worker_count(args.calc_thread),
+                args.calc_mode,
+                result_cache,
             )
             .get_process()
             .invoke_async()
         )
 
-        dfg_thread = (
-            get_dfg_frontend_descriptor(
-                root,
-                input_file_task,
-                pipe.as_sink(),
-                get_worker_count(args.calc_thread),
+        dfg_thread = None
+        if not args.fused:
+            dfg_thread = (
+                get_dfg_frontend_descriptor(
+                    root,
+                    input_file_task,
+                    pipe.as_sink(),
+                    get_worker_count(args.calc_thread),
+                    args.calc_mode,
+                    result_cache,
+                )
+                .get_process()
+                .invoke_async()
             )
-            .get_process()
-            .invoke_async()
-        )
 
         logger().info("Transferring to database...")
         back_thread = (
@@ -124,15 +162,25 @@ if __name__ == "__main__":
                 max_workers=get_worker_count(args.io_thread),
                 vertex_batch_size=get_batch_size(args.v_batch),
                 edge_batch_size=get_batch_size(args.e_batch),
+                streaming=args.streaming,
+                adaptive_batch=args.adaptive_batch,
+                async_window=args.async_window,
+                capacity=edge_capacity,
             )
             .get_process()
             .invoke_async()
         )
 
         cfg_thread.join()
+        seal_span_db()
         get_cg_frontend_descriptor(root, pipe.as_sink()).get_process().invoke()
-        dfg_thread.join()
+        if dfg_thread is not None:
+            dfg_thread.join()
         pipe.as_sink().seal()
         back_thread.join()
 
+        cache.flush()
+        stats = cache.stats()
+        if len(stats) > 0:
+            logger().info(f"Cache stats: {stats}")
         logger().info("Database ready to go! :)")